@@ -18,6 +18,8 @@
 #include "max/c/tensor.h"
 #include "max/c/value.h"
 
+#include "tensor_container.h"
+
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
@@ -35,22 +37,15 @@ void logError(const char *message) { logHelper("ERROR", message, '\n'); }
     return EXIT_FAILURE;                                                       \
   }
 
-// Read file at the given path. On failure abort.
-char *readFileOrExit(const char *filepath) {
-  FILE *file;
-  file = fopen(filepath, "rb");
-  if (!file) {
-    printf("failed to open %s. Aborting.\n", filepath);
+// Look up a tensor in the container and check its dtype. On failure abort.
+const TC_Entry *findTensorOrExit(const TC_File *file, const char *name,
+                                 M_Dtype dtype) {
+  const TC_Entry *entry = TC_find(file, name);
+  if (!entry || TC_dtypeFromString(entry->dtype) != dtype) {
+    printf("missing or mistyped tensor %s. Aborting.\n", name);
     abort();
   }
-  fseek(file, 0, SEEK_END);
-  long fileSize = ftell(file);
-  rewind(file);
-
-  char *buffer = (char *)malloc(fileSize * sizeof(char));
-  fread(buffer, fileSize, 1, file);
-  fclose(file);
-  return buffer;
+  return entry;
 }
 
 int main(int argc, char **argv) {
@@ -70,21 +65,29 @@ int main(int argc, char **argv) {
   const char *modelPath = argv[1];
   M_setModelPath(compileConfig, /*path=*/modelPath);
 
+  logInfo("Mapping inputs container");
+  TC_File inputsFile = {0};
+  if (TC_open("inputs.bin", &inputsFile) != 0)
+    return EXIT_FAILURE;
+  const TC_Entry *inputIds =
+      findTensorOrExit(&inputsFile, "input_ids", M_INT64);
+  const TC_Entry *pixelValues =
+      findTensorOrExit(&inputsFile, "pixel_values", M_FLOAT32);
+  const TC_Entry *attentionMask =
+      findTensorOrExit(&inputsFile, "attention_mask", M_INT64);
+
   logInfo("Setting InputSpecs for compilation");
-  int64_t *inputIdsShape =
-      (int64_t *)readFileOrExit("inputs/input_ids_shape.bin");
   M_TorchInputSpec *inputIdsInputSpec =
-      M_newTorchInputSpec(inputIdsShape, /*rankSize=*/2, /*dtype=*/M_INT64);
+      M_newTorchInputSpec((int64_t *)inputIds->shape,
+                          /*rankSize=*/inputIds->rank, /*dtype=*/M_INT64);
 
-  int64_t *pixelValuesShape =
-      (int64_t *)readFileOrExit("inputs/pixel_values_shape.bin");
   M_TorchInputSpec *pixelValuesInputSpec =
-      M_newTorchInputSpec(pixelValuesShape, /*rankSize=*/4, /*dtype=*/M_FLOAT32);
+      M_newTorchInputSpec((int64_t *)pixelValues->shape,
+                          /*rankSize=*/pixelValues->rank, /*dtype=*/M_FLOAT32);
 
-  int64_t *attentionMaskShape =
-      (int64_t *)readFileOrExit("inputs/attention_mask_shape.bin");
-  M_TorchInputSpec *attentionMaskInputSpec = M_newTorchInputSpec(
-      attentionMaskShape, /*rankSize=*/2, /*dtype=*/M_INT64);
+  M_TorchInputSpec *attentionMaskInputSpec =
+      M_newTorchInputSpec((int64_t *)attentionMask->shape,
+                          /*rankSize=*/attentionMask->rank, /*dtype=*/M_INT64);
 
 
   M_TorchInputSpec *inputSpecs[3] = {inputIdsInputSpec, pixelValuesInputSpec, attentionMaskInputSpec};
@@ -119,30 +122,26 @@ int main(int argc, char **argv) {
   logInfo("Preparing inputs...");
   M_AsyncTensorMap *inputToModel = M_newAsyncTensorMap(context);
 
-  M_TensorSpec *inputIdsSpec =
-      M_newTensorSpec(inputIdsShape, /*rankSize=*/2, /*dtype=*/M_INT64,
-                      /*tensorName=*/"input_ids");
-
-  int64_t *inputIdsTensor = (int64_t *)readFileOrExit("inputs/input_ids.bin");
-  M_borrowTensorInto(inputToModel, inputIdsTensor, inputIdsSpec, status);
+  // The tensors are borrowed straight from the mapped file, no copies.
+  M_TensorSpec *inputIdsSpec = M_newTensorSpec(
+      (int64_t *)inputIds->shape, /*rankSize=*/inputIds->rank,
+      /*dtype=*/M_INT64, /*tensorName=*/"input_ids");
+  M_borrowTensorInto(inputToModel, TC_data(&inputsFile, inputIds),
+                     inputIdsSpec, status);
   CHECK(status);
 
-  M_TensorSpec *pixelValuesSpec =
-      M_newTensorSpec(pixelValuesShape, /*rankSize=*/4, /*dtype=*/M_FLOAT32,
-                      /*tensorName=*/"pixel_values");
-  float *pixelValuesTensor =
-      (float *)readFileOrExit("inputs/pixel_values.bin");
-  M_borrowTensorInto(inputToModel, pixelValuesTensor, pixelValuesSpec,
-                     status);
+  M_TensorSpec *pixelValuesSpec = M_newTensorSpec(
+      (int64_t *)pixelValues->shape, /*rankSize=*/pixelValues->rank,
+      /*dtype=*/M_FLOAT32, /*tensorName=*/"pixel_values");
+  M_borrowTensorInto(inputToModel, TC_data(&inputsFile, pixelValues),
+                     pixelValuesSpec, status);
   CHECK(status);
 
-  M_TensorSpec *attentionMaskSpec =
-      M_newTensorSpec(attentionMaskShape, /*rankSize=*/2, /*dtype=*/M_INT64,
-                      /*tensorName=*/"attention_mask");
-  int64_t *attentionMaskTensor =
-      (int64_t *)readFileOrExit("inputs/attention_mask.bin");
-  M_borrowTensorInto(inputToModel, attentionMaskTensor, attentionMaskSpec,
-                     status);
+  M_TensorSpec *attentionMaskSpec = M_newTensorSpec(
+      (int64_t *)attentionMask->shape, /*rankSize=*/attentionMask->rank,
+      /*dtype=*/M_INT64, /*tensorName=*/"attention_mask");
+  M_borrowTensorInto(inputToModel, TC_data(&inputsFile, attentionMask),
+                     attentionMaskSpec, status);
   CHECK(status);
 
   logInfo("Running Inference...");
@@ -160,22 +159,18 @@ int main(int argc, char **argv) {
   size_t numElements = M_getTensorNumElements(result);
   printf("Tensor size: %ld\n", numElements);
   M_Dtype dtype = M_getTensorType(result);
-  const char *outputFilePath = "outputs.bin";
-  FILE *file = fopen(outputFilePath, "wb");
-  if (!file) {
-    printf("failed to open %s. Aborting.\n", outputFilePath);
+  M_TensorSpec *resultSpec = M_getTensorSpec(result);
+  int64_t resultRank = M_getRank(resultSpec);
+  int64_t resultShape[TC_MAX_RANK];
+  for (int64_t i = 0; i < resultRank && i < TC_MAX_RANK; i++)
+    resultShape[i] = M_getDimAt(resultSpec, i);
+  if (TC_writeSingle("outputs.bin", "result0", dtype, resultShape,
+                     (uint32_t)resultRank, M_getTensorData(result),
+                     numElements * M_sizeOf(dtype)) != 0) {
+    printf("failed to write outputs.bin. Aborting.\n");
     return EXIT_FAILURE;
   }
-  fwrite(M_getTensorData(result), M_sizeOf(dtype), numElements, file);
-  fclose(file);
-
-  // free memory buffer
-  free(inputIdsTensor);
-  free(pixelValuesTensor);
-  free(attentionMaskTensor);
-  free(inputIdsShape);
-  free(pixelValuesShape);
-  free(attentionMaskShape);
+  M_freeTensorSpec(resultSpec);
 
   // free resources
   M_freeTensor(result);
@@ -190,6 +185,9 @@ int main(int argc, char **argv) {
 
   M_freeAsyncTensorMap(inputToModel);
 
+  // unmap inputs once nothing borrows from them anymore
+  TC_close(&inputsFile);
+
   M_freeTensorNameArray(tensorNames);
 
   M_freeModel(model);
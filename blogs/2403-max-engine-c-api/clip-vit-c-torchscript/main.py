@@ -1,9 +1,16 @@
+import logging
+import time
 import requests
 from PIL import Image
 from max import engine
 import torch
 from transformers import CLIPProcessor
 
+from model_cache import ModelCache
+from preprocess import input_specs
+
+logging.basicConfig(level=logging.INFO)
+
 url = "http://images.cocodataset.org/val2017/000000039769.jpg"
 image = Image.open(requests.get(url, stream=True).raw)
 
@@ -26,18 +33,23 @@ print(
 )
 
 session = engine.InferenceSession()
+# same input order and dtypes as the containers written by preprocess.py
+specs = input_specs(inputs)
 input_spec_lst = [
-    engine.TorchInputSpec(shape=inputs["input_ids"].size(), dtype=engine.DType.int64),
-    engine.TorchInputSpec(
-        shape=inputs["pixel_values"].size(), dtype=engine.DType.float32
-    ),
-    engine.TorchInputSpec(
-        shape=inputs["attention_mask"].size(), dtype=engine.DType.int64
-    ),
+    engine.TorchInputSpec(shape=list(shape), dtype=getattr(engine.DType, dtype))
+    for shape, dtype in specs
 ]
 print(input_spec_lst)
 options = engine.TorchLoadOptions(input_spec_lst)
-clip_vit = session.load("models/clip_vit.torchscript", options)
+# Reuse the compiled model across runs as long as the TorchScript file and the
+# input shapes are unchanged
+load_start = time.perf_counter()
+clip_vit = ModelCache(session).load(
+    "models/clip_vit.torchscript",
+    options,
+    input_specs=specs,
+)
+print(f"Model load time: {time.perf_counter() - load_start:.2f}s")
 outputs = clip_vit.execute(**inputs)
 
 logits = torch.from_numpy(outputs["result0"])
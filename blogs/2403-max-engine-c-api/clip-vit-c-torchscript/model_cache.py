@@ -0,0 +1,165 @@
+"""Model loading helpers that avoid redoing work across script restarts.
+
+- `export_if_changed` only re-exports a model artifact (e.g. a SavedModel) when
+  its source description changed or the artifact is missing.
+- `ModelCache.load` keys a model on the hash of its file(s), the input specs and
+  the engine version. Where the engine can serialize compiled models, the
+  compiled artifact is stored on disk and reloaded on the next start instead
+  of recompiling. Otherwise a warning says that every start recompiles.
+
+Every step logs how long it took so cold and warm starts can be compared.
+
+The same file is in `max-blogpost-demos` and
+`2403-max-engine-c-api/clip-vit-c-torchscript`. Each blog folder is used on its
+own, so keep the two copies identical.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("MAX_MODEL_CACHE", "~/.cache/max-devrel-extras/models")
+).expanduser()
+STAMP_FILE = ".export-stamp.json"
+
+
+@contextmanager
+def timed(label):
+    start = time.perf_counter()
+    yield
+    logger.info(f"{label} took {time.perf_counter() - start:.2f}s")
+
+
+def _iter_files(path):
+    path = Path(path)
+    if path.is_file():
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name != STAMP_FILE:
+                yield Path(root) / name
+
+
+def file_digest(path, cache_dir=DEFAULT_CACHE_DIR):
+    """sha256 over a file or a directory tree.
+
+    Digests are remembered per (path, size, mtime) so unchanged models are not
+    rehashed on every start.
+    """
+    files = list(_iter_files(path))
+    stats = [(str(f), f.stat().st_size, f.stat().st_mtime_ns) for f in files]
+    stat_key = hashlib.sha256(json.dumps(stats).encode()).hexdigest()
+    memo = Path(cache_dir) / "digests" / stat_key
+    if memo.exists():
+        return memo.read_text()
+
+    sha = hashlib.sha256()
+    for f in files:
+        name = f.name if f == Path(path) else str(f.relative_to(path))
+        sha.update(name.encode())
+        with open(f, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                sha.update(chunk)
+    digest = sha.hexdigest()
+    memo.parent.mkdir(parents=True, exist_ok=True)
+    memo.write_text(digest)
+    return digest
+
+
+def _stamp_path(artifact_path):
+    if artifact_path.is_dir():
+        return artifact_path / STAMP_FILE
+    return artifact_path.with_name(artifact_path.name + STAMP_FILE)
+
+
+def export_if_changed(artifact_path, export_fn, source):
+    """Run `export_fn(artifact_path)` unless the artifact was already exported
+    from the same `source` (any JSON-serializable description, e.g. model name,
+    weights and framework version). Returns True if an export happened."""
+    artifact_path = Path(artifact_path)
+    stamp = json.dumps(source, sort_keys=True)
+    stamp_path = _stamp_path(artifact_path)
+    if artifact_path.exists() and stamp_path.exists():
+        if stamp_path.read_text() == stamp:
+            logger.info(f"{artifact_path} is up to date, skipping export")
+            return False
+
+    with timed(f"Exporting {artifact_path}"):
+        export_fn(artifact_path)
+    _stamp_path(artifact_path).write_text(stamp)
+    return True
+
+
+class ModelCache:
+    """Loads models through a MAX Engine `InferenceSession` with caching."""
+
+    def __init__(self, session, cache_dir=DEFAULT_CACHE_DIR):
+        self.session = session
+        self.cache_dir = Path(cache_dir)
+        # False once the engine turned out unable to serialize compiled models
+        self.persistent = True
+
+    def key(self, model_path, input_specs=None):
+        from max import engine
+
+        with timed(f"Hashing {model_path}"):
+            digest = file_digest(model_path, self.cache_dir)
+        specs = [(list(shape), str(dtype)) for shape, dtype in input_specs or []]
+        payload = json.dumps(
+            [digest, specs, getattr(engine, "__version__", "")], sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def load(self, model_path, *args, input_specs=None, **kwargs):
+        """Like `session.load(model_path, *args, **kwargs)`.
+
+        `input_specs` is a list of (shape, dtype) pairs describing the inputs the
+        model is compiled for; it is part of the cache key.
+        """
+        start = time.perf_counter()
+        key = self.key(model_path, input_specs)
+        compiled_path = self.cache_dir / f"{key}.mef"
+        model = None
+        if compiled_path.exists():
+            try:
+                with timed(f"Loading cached compiled model {compiled_path}"):
+                    model = self.session.load(str(compiled_path))
+            except Exception as e:
+                logger.warning(f"Ignoring unusable cache entry {compiled_path}: {e}")
+
+        if model is None:
+            with timed(f"Compiling {model_path}"):
+                model = self.session.load(str(model_path), *args, **kwargs)
+            self._store(model, compiled_path)
+
+        logger.info(f"Model ready in {time.perf_counter() - start:.2f}s")
+        return model
+
+    def _store(self, model, compiled_path):
+        # Serializing is not part of the public Model API, only some engine
+        # versions have it. Say so instead of silently caching nothing.
+        export = getattr(model, "_export_mef", None)
+        if export is None:
+            self.persistent = False
+            logger.warning(
+                "This MAX Engine version can't serialize compiled models, "
+                f"{compiled_path.name} is not cached and every start recompiles"
+            )
+            return
+        compiled_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = compiled_path.with_suffix(".tmp")
+        try:
+            export(str(tmp_path))
+            tmp_path.replace(compiled_path)
+        except Exception as e:
+            logger.warning(f"Could not cache compiled model: {e}")
+            tmp_path.unlink(missing_ok=True)
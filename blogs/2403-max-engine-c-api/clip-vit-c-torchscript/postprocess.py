@@ -1,10 +1,20 @@
 import numpy as np
 import torch
 
+from tensor_container import read_tensors
+
 
 def main():
-    logits = torch.from_numpy(np.fromfile("outputs.bin", dtype=np.float32))
+    outputs = read_tensors("outputs.bin")
+    logits = torch.from_numpy(np.asarray(outputs["result0"]))
     scores = logits.softmax(dim=-1)
+    # images that failed to load in preprocess.py --images are zero-filled
+    valid = read_tensors("inputs.bin").get("valid")
+    if valid is not None:
+        valid = np.asarray(valid)
+        if not valid.all():
+            print(f"Skipping {int((~valid).sum())} images that failed to load: rows {np.flatnonzero(~valid).tolist()}")
+        scores = scores[torch.from_numpy(valid)]
     print(f"Scores: {scores.numpy()}")
 
 
@@ -1,17 +1,28 @@
 import argparse
+import io
 import logging
 import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from PIL import Image, UnidentifiedImageError
-from transformers import CLIPProcessor
+from transformers import CLIPImageProcessor, CLIPProcessor
 import numpy as np
 
+from tensor_container import create_tensors, write_tensors
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+INPUTS_PATH = "inputs.bin"
+MODEL_ID = "openai/clip-vit-base-patch32"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp"}
+# inputs of the traced clip-vit model, in its argument order
+INPUT_DTYPES = {"input_ids": np.int64, "pixel_values": np.float32, "attention_mask": np.int64}
+
 parser = argparse.ArgumentParser(description="Resnet build example")
 aa = parser.add_argument
 aa(
@@ -20,7 +31,15 @@ aa(
     help="inputs comma separated text for text-image similarity based on clip-vit",
 )
 aa("--url", type=str, help="url to download the image")
-args = parser.parse_args()
+aa(
+    "--images",
+    type=str,
+    nargs="+",
+    help="image urls, files or directories to preprocess in parallel batches",
+)
+aa("--batch-size", type=int, default=32, help="images per streamed batch")
+aa("--workers", type=int, default=None, help="decode/resize worker processes")
+aa("--io-threads", type=int, default=16, help="concurrent downloads/file reads")
 
 
 def download_image(url):
@@ -36,38 +55,181 @@ def download_image(url):
         logger.exception(f"An unexpected error occurred: {e}")
 
 
-def save_as_bin(inputs):
-    input_dir = Path("inputs")
-    input_dir.mkdir(exist_ok=True)
-    created_files = []
+def save_as_bin(inputs, path=INPUTS_PATH):
+    tensors = {}
     for name, value in inputs.items():
-        if name in ("input_ids", "attention_mask"):
-            value = value.astype(np.int64)
-        elif name == "pixel_values":
-            value = value.astype(np.float32)
-        else:
+        if name not in INPUT_DTYPES:
             raise ValueError(f"Unknown input name for clip-vit model. Given {name}")
+        tensors[name] = value.astype(INPUT_DTYPES[name], copy=False)
 
-        filename = input_dir / name
-        filename = filename.with_suffix(".bin")
-        filename.unlink(missing_ok=True)
-        value.tofile(filename)
+    path = write_tensors(path, tensors)
+    logger.info(
+        f"Created {path}: {[(name, v.shape, str(v.dtype)) for name, v in tensors.items()]}"
+    )
+    return path
 
-        shape = np.array(value.shape).astype(np.int64)
-        shape_file = input_dir / f"{name}_shape.bin"
-        shape.tofile(shape_file)
-        created_files += [str(filename), str(shape_file)]
 
-    logger.info(f"Created files: {created_files}")
-    return
+def input_specs(inputs):
+    """(shape, dtype name) of each model input, in the model's argument order."""
+    return [
+        (tuple(inputs[name].shape), np.dtype(dtype).name)
+        for name, dtype in INPUT_DTYPES.items()
+    ]
+
+
+def collect_sources(images):
+    sources = []
+    for item in images:
+        path = Path(item)
+        if path.is_dir():
+            sources += sorted(
+                str(p) for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+            )
+        else:
+            sources.append(item)
+    return sources
+
+
+def new_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_bytes(session, source):
+    try:
+        if source.startswith(("http://", "https://")):
+            response = session.get(source, timeout=30)
+            response.raise_for_status()
+            return response.content
+        return Path(source).read_bytes()
+    except (RequestException, OSError) as e:
+        logger.error(f"Failed to fetch {source}: {e}")
+
+
+_image_processor = None
+
+
+def _init_worker():
+    global _image_processor
+    _image_processor = CLIPImageProcessor.from_pretrained(MODEL_ID)
+
+
+def _decode_and_resize(data):
+    if data is None:
+        return None
+    # truncated files raise OSError, other decoders their own errors,
+    # so any failure only drops this image
+    try:
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        return _image_processor(images=image, return_tensors="np")["pixel_values"][0]
+    except UnidentifiedImageError:
+        logger.error("The fetched content is not a valid image.")
+    except Exception as e:
+        logger.error(f"Failed to decode image: {e}")
+    return None
+
+
+def preprocess_stream(
+    texts, images, path=INPUTS_PATH, batch_size=32, workers=None, io_threads=16
+):
+    """Preprocess many images into one container, batch by batch.
+
+    Downloads/file reads run on a thread pool sharing one pooled HTTP session
+    and decoding/resizing runs on a process pool. While one batch is decoded the
+    next batch is already being fetched, and every finished batch is written
+    straight into its slice of the memory-mapped `pixel_values` tensor.
+    Images that fail to load are logged and left as zeros, with their row
+    of the boolean `valid` tensor set to False so they are not scored.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    sources = collect_sources(images)
+    if not sources:
+        raise ValueError("No images found")
+
+    processor = CLIPProcessor.from_pretrained(MODEL_ID)
+    text_inputs = processor.tokenizer(texts, return_tensors="np", padding=True)
+    input_ids = text_inputs["input_ids"].astype(np.int64, copy=False)
+    attention_mask = text_inputs["attention_mask"].astype(np.int64, copy=False)
+    crop = processor.image_processor.crop_size
+    pixel_shape = (len(sources), 3, crop["height"], crop["width"])
+
+    tmp_path = Path(path).with_name(f".{Path(path).name}.tmp")
+    try:
+        tensors = create_tensors(
+            tmp_path,
+            {
+                "input_ids": (input_ids.shape, np.int64),
+                "pixel_values": (pixel_shape, np.float32),
+                "attention_mask": (attention_mask.shape, np.int64),
+                # not a model input, the C runner only looks up the three above
+                "valid": ((len(sources),), np.bool_),
+            },
+        )
+        tensors["input_ids"][...] = input_ids
+        tensors["attention_mask"][...] = attention_mask
+        pixel_values = tensors["pixel_values"]
+        valid = tensors["valid"]
+
+        batches = [
+            sources[i : i + batch_size] for i in range(0, len(sources), batch_size)
+        ]
+        session = new_session(io_threads)
+        failed = 0
+        with ThreadPoolExecutor(io_threads) as io_pool, ProcessPoolExecutor(
+            workers, initializer=_init_worker
+        ) as cpu_pool:
+
+            def submit_fetch(batch):
+                return [io_pool.submit(fetch_bytes, session, source) for source in batch]
+
+            pending = submit_fetch(batches[0])
+            for i in range(len(batches)):
+                datas = [future.result() for future in pending]
+                if i + 1 < len(batches):
+                    pending = submit_fetch(batches[i + 1])
+                start = i * batch_size
+                for j, pixels in enumerate(cpu_pool.map(_decode_and_resize, datas)):
+                    if pixels is None:
+                        failed += 1
+                        logger.warning(f"Skipping {sources[start + j]}")
+                        continue
+                    pixel_values[start + j] = pixels
+                    valid[start + j] = True
+                logger.info(f"Preprocessed {start + len(datas)}/{len(sources)} images")
+
+        for tensor in tensors.values():
+            tensor.flush()
+        del tensors, pixel_values, valid
+        Path(tmp_path).replace(path)
+    finally:
+        # a failed run leaves no half-written container behind
+        Path(tmp_path).unlink(missing_ok=True)
+    if failed:
+        logger.warning(f"{failed} images could not be loaded and are marked invalid")
+    logger.info(f"Created {path} with {len(sources)} images and {len(texts)} texts")
+    return path
 
 
 def main():
+    args = parser.parse_args()
+    texts = args.text.split(",")
+    if args.images:
+        preprocess_stream(
+            texts,
+            args.images,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            io_threads=args.io_threads,
+        )
+        return
+
     image = download_image(args.url)
-    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-    inputs = processor(
-        text=args.text.split(","), images=image, return_tensors="np", padding=True
-    )
+    processor = CLIPProcessor.from_pretrained(MODEL_ID)
+    inputs = processor(text=texts, images=image, return_tensors="np", padding=True)
     save_as_bin(inputs)
     return
 
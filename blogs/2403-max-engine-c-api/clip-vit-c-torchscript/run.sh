@@ -23,6 +23,9 @@ echo "image url $URL"
 # preprocess inputs
 python3 preprocess.py --text "$TEXT"  --url "$URL"
 
+# or preprocess a directory and/or list of urls in parallel, streamed in batches
+# python3 preprocess.py --text "$TEXT" --images images/ "$URL" --batch-size 32
+
 # Build
 cmake -B build -S "$CURRENT_DIR"
 cmake --build build
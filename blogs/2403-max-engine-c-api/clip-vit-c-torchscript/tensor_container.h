@@ -0,0 +1,200 @@
+/*******************************************************************************
+ * Copyright (c) 2024, Modular Inc. All rights reserved.
+ *
+ * Licensed under the Apache License v2.0 with LLVM Exceptions:
+ * https://llvm.org/LICENSE.txt
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ *******************************************************************************/
+
+// Reader/writer for the tensor container produced by tensor_container.py.
+// Inputs are memory-mapped and handed to the engine without copying.
+
+#ifndef TENSOR_CONTAINER_H
+#define TENSOR_CONTAINER_H
+
+#include "max/c/tensor.h"
+
+#include <fcntl.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#define TC_MAGIC "MAXTNSR"
+#define TC_VERSION 1
+#define TC_ALIGNMENT 64
+#define TC_MAX_NAME_LEN 64
+#define TC_MAX_RANK 8
+
+typedef struct {
+  char magic[8];
+  uint32_t version;
+  uint32_t numTensors;
+  uint64_t dataOffset;
+} TC_Header;
+
+typedef struct {
+  char name[TC_MAX_NAME_LEN];
+  char dtype[8];
+  uint32_t rank;
+  uint32_t pad;
+  int64_t shape[TC_MAX_RANK];
+  uint64_t offset;
+  uint64_t nbytes;
+} TC_Entry;
+
+typedef struct {
+  void *base;
+  size_t size;
+  const TC_Header *header;
+  const TC_Entry *entries;
+} TC_File;
+
+// Map dtype strings written by numpy (`ndarray.dtype.str`) to engine dtypes.
+static inline M_Dtype TC_dtypeFromString(const char *dtype) {
+  if (strncmp(dtype, "<i8", 8) == 0)
+    return M_INT64;
+  if (strncmp(dtype, "<i4", 8) == 0)
+    return M_INT32;
+  if (strncmp(dtype, "<f4", 8) == 0)
+    return M_FLOAT32;
+  if (strncmp(dtype, "<f2", 8) == 0)
+    return M_FLOAT16;
+  if (strncmp(dtype, "<f8", 8) == 0)
+    return M_FLOAT64;
+  if (strncmp(dtype, "|u1", 8) == 0)
+    return M_UINT8;
+  if (strncmp(dtype, "|b1", 8) == 0)
+    return M_BOOL;
+  return M_UNKNOWN;
+}
+
+static inline const char *TC_dtypeToString(M_Dtype dtype) {
+  switch (dtype) {
+  case M_INT64:
+    return "<i8";
+  case M_INT32:
+    return "<i4";
+  case M_FLOAT32:
+    return "<f4";
+  case M_FLOAT16:
+    return "<f2";
+  case M_FLOAT64:
+    return "<f8";
+  case M_UINT8:
+    return "|u1";
+  case M_BOOL:
+    return "|b1";
+  default:
+    return NULL;
+  }
+}
+
+// Memory-map the container at `path`. Returns 0 on success.
+static inline int TC_open(const char *path, TC_File *file) {
+  int fd = open(path, O_RDONLY);
+  if (fd < 0) {
+    printf("failed to open %s\n", path);
+    return -1;
+  }
+  struct stat st;
+  if (fstat(fd, &st) != 0 || (size_t)st.st_size < sizeof(TC_Header)) {
+    printf("invalid tensor container %s\n", path);
+    close(fd);
+    return -1;
+  }
+  void *base = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+  close(fd);
+  if (base == MAP_FAILED) {
+    printf("failed to mmap %s\n", path);
+    return -1;
+  }
+
+  const TC_Header *header = (const TC_Header *)base;
+  if (memcmp(header->magic, TC_MAGIC, sizeof(TC_MAGIC)) != 0 ||
+      header->version != TC_VERSION ||
+      sizeof(TC_Header) + header->numTensors * sizeof(TC_Entry) >
+          (size_t)st.st_size) {
+    printf("invalid tensor container %s\n", path);
+    munmap(base, st.st_size);
+    return -1;
+  }
+
+  file->base = base;
+  file->size = st.st_size;
+  file->header = header;
+  file->entries = (const TC_Entry *)((const char *)base + sizeof(TC_Header));
+  return 0;
+}
+
+static inline void TC_close(TC_File *file) {
+  if (file->base)
+    munmap(file->base, file->size);
+  file->base = NULL;
+}
+
+static inline const TC_Entry *TC_find(const TC_File *file, const char *name) {
+  for (uint32_t i = 0; i < file->header->numTensors; i++) {
+    const TC_Entry *entry = &file->entries[i];
+    if (strncmp(entry->name, name, TC_MAX_NAME_LEN) == 0) {
+      if (entry->offset + entry->nbytes > file->size)
+        return NULL;
+      return entry;
+    }
+  }
+  return NULL;
+}
+
+static inline void *TC_data(const TC_File *file, const TC_Entry *entry) {
+  return (char *)file->base + entry->offset;
+}
+
+// Write a single-tensor container to `path`. Returns 0 on success.
+static inline int TC_writeSingle(const char *path, const char *name,
+                                 M_Dtype dtype, const int64_t *shape,
+                                 uint32_t rank, const void *data,
+                                 uint64_t nbytes) {
+  const char *dtypeStr = TC_dtypeToString(dtype);
+  if (!dtypeStr || rank > TC_MAX_RANK || strlen(name) >= TC_MAX_NAME_LEN) {
+    printf("cannot store tensor %s in a container\n", name);
+    return -1;
+  }
+
+  TC_Header header = {0};
+  memcpy(header.magic, TC_MAGIC, sizeof(TC_MAGIC));
+  header.version = TC_VERSION;
+  header.numTensors = 1;
+  header.dataOffset = (sizeof(TC_Header) + sizeof(TC_Entry) + TC_ALIGNMENT - 1) /
+                      TC_ALIGNMENT * TC_ALIGNMENT;
+
+  TC_Entry entry = {0};
+  strncpy(entry.name, name, TC_MAX_NAME_LEN - 1);
+  strncpy(entry.dtype, dtypeStr, sizeof(entry.dtype));
+  entry.rank = rank;
+  memcpy(entry.shape, shape, rank * sizeof(int64_t));
+  entry.offset = header.dataOffset;
+  entry.nbytes = nbytes;
+
+  FILE *out = fopen(path, "wb");
+  if (!out) {
+    printf("failed to open %s\n", path);
+    return -1;
+  }
+  static const char zeros[TC_ALIGNMENT] = {0};
+  size_t padding = header.dataOffset - sizeof(TC_Header) - sizeof(TC_Entry);
+  int ok = fwrite(&header, sizeof(header), 1, out) == 1 &&
+           fwrite(&entry, sizeof(entry), 1, out) == 1 &&
+           fwrite(zeros, 1, padding, out) == padding &&
+           fwrite(data, 1, nbytes, out) == nbytes;
+  fclose(out);
+  return ok ? 0 : -1;
+}
+
+#endif // TENSOR_CONTAINER_H
@@ -0,0 +1,142 @@
+"""Self-describing tensor container shared by the Python scripts and the C runner.
+
+File layout (little-endian), mirrored by `tensor_container.h`:
+
+    header   magic[8] | version u32 | num_tensors u32 | data_offset u64
+    entries  num_tensors x (name[64] | dtype[8] | rank u32 | pad u32
+                            | shape i64[8] | offset u64 | nbytes u64)
+    data     each tensor starts at a 64-byte aligned offset
+
+Tensors keep their leading batch dimension, so many samples can live in a
+single file and be read back zero-copy with `np.memmap`.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"MAXTNSR\0"
+VERSION = 1
+ALIGNMENT = 64
+MAX_NAME_LEN = 64
+MAX_RANK = 8
+
+HEADER_DTYPE = np.dtype(
+    [("magic", "S8"), ("version", "<u4"), ("num_tensors", "<u4"), ("data_offset", "<u8")]
+)
+ENTRY_DTYPE = np.dtype(
+    [
+        ("name", f"S{MAX_NAME_LEN}"),
+        ("dtype", "S8"),
+        ("rank", "<u4"),
+        ("pad", "<u4"),
+        ("shape", "<i8", (MAX_RANK,)),
+        ("offset", "<u8"),
+        ("nbytes", "<u8"),
+    ]
+)
+
+# dtypes understood by the C runner (see `TC_dtypeFromString` in tensor_container.h)
+SUPPORTED_DTYPES = ("<i8", "<i4", "<f4", "<f2", "<f8", "|u1", "|b1")
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _layout(specs):
+    entries = np.zeros(len(specs), dtype=ENTRY_DTYPE)
+    offset = _align(HEADER_DTYPE.itemsize + ENTRY_DTYPE.itemsize * len(specs))
+    data_offset = offset
+    for i, (name, (shape, dtype)) in enumerate(specs.items()):
+        dtype = np.dtype(dtype).newbyteorder("<")
+        if dtype.str not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype} for tensor {name}")
+        if len(name.encode()) >= MAX_NAME_LEN:
+            raise ValueError(f"Tensor name too long: {name}")
+        if len(shape) > MAX_RANK:
+            raise ValueError(f"Tensor {name} has rank {len(shape)} > {MAX_RANK}")
+
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        entries["name"][i] = name.encode()
+        entries["dtype"][i] = dtype.str.encode()
+        entries["rank"][i] = len(shape)
+        entries["shape"][i, : len(shape)] = shape
+        entries["offset"][i] = offset
+        entries["nbytes"][i] = nbytes
+        offset = _align(offset + nbytes)
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["num_tensors"] = len(specs)
+    header["data_offset"] = data_offset
+    return header, entries, max(offset, data_offset)
+
+
+def _views(path, entries, mode):
+    tensors = {}
+    for entry in entries:
+        shape = tuple(int(d) for d in entry["shape"][: entry["rank"]])
+        tensors[entry["name"].decode()] = np.memmap(
+            path,
+            dtype=np.dtype(entry["dtype"].decode()),
+            mode=mode,
+            offset=int(entry["offset"]),
+            shape=shape,
+        )
+    return tensors
+
+
+def create_tensors(path, specs):
+    """Allocate a container for `specs` ({name: (shape, dtype)}) and return
+    writable memmaps, so producers can fill batches in place."""
+    path = Path(path)
+    header, entries, total_size = _layout(specs)
+    with open(path, "wb") as f:
+        f.truncate(total_size)
+        f.write(header.tobytes())
+        f.write(entries.tobytes())
+    return _views(path, entries, mode="r+")
+
+
+def write_tensors(path, tensors):
+    """Write a dict of arrays into a single container file.
+
+    The file is written next to `path` and renamed into place, so readers never
+    observe a partially written container.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    specs = {name: (value.shape, value.dtype) for name, value in tensors.items()}
+    views = create_tensors(tmp_path, specs)
+    for name, view in views.items():
+        view[...] = tensors[name]
+        view.flush()
+    del views
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_header(path):
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if header.size != 1 or header["magic"][0] != MAGIC.rstrip(b"\0"):
+        raise ValueError(f"{path} is not a tensor container")
+    if header["version"][0] != VERSION:
+        raise ValueError(
+            f"Unsupported container version {header['version'][0]} in {path}"
+        )
+    entries = np.fromfile(
+        path,
+        dtype=ENTRY_DTYPE,
+        count=int(header["num_tensors"][0]),
+        offset=HEADER_DTYPE.itemsize,
+    )
+    return header[0], entries
+
+
+def read_tensors(path, mode="r"):
+    """Map every tensor of the container at `path` without copying."""
+    _, entries = read_header(path)
+    return _views(path, entries, mode=mode)
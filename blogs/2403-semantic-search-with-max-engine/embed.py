@@ -0,0 +1,112 @@
+"""Streaming, length-bucketed sentence embeddings with MAX Engine.
+
+Sentences are read in chunks and tokenized without padding. Each chunk is
+sorted by token length and cut into batches, so a batch is only padded to its
+own longest sentence instead of the longest sentence in the dataset. The CLS
+embedding of every batch is written straight into a preallocated array,
+optionally a memory-mapped `.npy` file, at the sentence's original position.
+"""
+
+import os
+import warnings
+from itertools import islice
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+def length_batches(lengths, batch_size):
+    """Indices of sentences of similar length, `batch_size` at a time."""
+    order = np.argsort(lengths, kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def pad_batch(encodings, indices, pad_token_id=0, pad_to_multiple_of=8):
+    """Model inputs for the sentences at `indices`, padded to the longest of them."""
+    input_ids = [encodings["input_ids"][i] for i in indices]
+    longest = max(len(ids) for ids in input_ids)
+    # fewer distinct shapes for the model to handle
+    width = -(-longest // pad_to_multiple_of) * pad_to_multiple_of
+    batch = {
+        "input_ids": np.full((len(indices), width), pad_token_id, dtype=np.int64),
+        "token_type_ids": np.zeros((len(indices), width), dtype=np.int64),
+        "attention_mask": np.zeros((len(indices), width), dtype=np.int64),
+    }
+    for row, ids in enumerate(input_ids):
+        batch["input_ids"][row, :len(ids)] = ids
+        batch["attention_mask"][row, :len(ids)] = 1
+    return batch
+
+
+def embed_sentences(
+    maxmodel,
+    tokenizer,
+    sentences: Iterable[str],
+    batch_size: int = 128,
+    max_length: int = 512,
+    chunk_size: int = 16384,
+    num_sentences: Optional[int] = None,
+    dtype=np.float32,
+    out_path: Optional[str] = None,
+    pad_to_multiple_of: int = 8,
+) -> np.ndarray:
+    """CLS embeddings of `sentences`, one row per sentence in input order.
+
+    `sentences` can be any iterable, e.g. a generator over a file. Only
+    `chunk_size` sentences are tokenized at a time. The output is allocated
+    once, `num_sentences` rows (defaults to `len(sentences)`), as float16 or
+    float32. With `out_path` it is a memory-mapped `.npy` file, so the
+    embeddings never have to fit in memory.
+
+    If `sentences` runs out before `num_sentences`, a warning is issued and
+    only the embedded rows are returned. The `out_path` file is rewritten with
+    just those rows too.
+    """
+    if num_sentences is None:
+        if not hasattr(sentences, "__len__"):
+            raise ValueError("num_sentences is required when sentences has no len()")
+        num_sentences = len(sentences)
+    pad_token_id = tokenizer.pad_token_id or 0
+
+    sentences = iter(sentences)
+    out = None
+    start = 0
+    while start < num_sentences:
+        chunk = list(islice(sentences, min(chunk_size, num_sentences - start)))
+        if not chunk:
+            break
+        encodings = tokenizer(chunk, max_length=max_length, truncation=True)
+        lengths = np.fromiter((len(ids) for ids in encodings["input_ids"]), dtype=np.int64,
+                              count=len(chunk))
+        for indices in length_batches(lengths, batch_size):
+            batch = pad_batch(encodings, indices, pad_token_id, pad_to_multiple_of)
+            outputs = maxmodel.execute(**batch)
+            # Extract the CLS token embedding
+            embeddings = outputs["last_hidden_state"][:, 0, :]
+            if out is None:
+                shape = (num_sentences, embeddings.shape[-1])
+                if out_path is not None:
+                    out = np.lib.format.open_memmap(out_path, mode="w+", dtype=dtype, shape=shape)
+                else:
+                    out = np.empty(shape, dtype=dtype)
+            out[start + indices] = embeddings
+        start += len(chunk)
+
+    if start < num_sentences:
+        warnings.warn(f"Got {start} sentences, fewer than num_sentences={num_sentences}")
+    if out is None:
+        return np.empty((0, 0), dtype=dtype)
+    if out_path is None:
+        return out[:start]
+    out.flush()
+    if start < num_sentences:
+        # the .npy header records num_sentences rows, keep only the embedded ones
+        tmp_path = f"{out_path}.tmp"
+        trimmed = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype,
+                                            shape=(start, out.shape[1]))
+        trimmed[:] = out[:start]
+        trimmed.flush()
+        del out, trimmed
+        os.replace(tmp_path, out_path)
+        out = np.load(out_path, mmap_mode="r+")
+    return out
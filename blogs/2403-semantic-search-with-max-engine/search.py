@@ -0,0 +1,105 @@
+"""Bulk ingestion and batched k-nearest-neighbour classification.
+
+`upsert_embeddings` loads a whole embedding array into a Chroma collection in
+large batches. `NumpyIndex` is an exact in-memory index with the same
+`query` interface, for local testing without Chroma. `neighbour_label_probs`
+queries either one with many embeddings at once.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def upsert_embeddings(collection, documents: Sequence[str], embeddings: np.ndarray,
+                      metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+                      ids: Optional[Sequence[str]] = None, batch_size: int = 4096):
+    """Upsert `embeddings` (one row per document) `batch_size` rows per call."""
+    ids = ids if ids is not None else [str(i) for i in range(len(embeddings))]
+    for start in range(0, len(embeddings), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            ids=list(ids[start:end]),
+            documents=list(documents[start:end]),
+            embeddings=np.asarray(embeddings[start:end], dtype=np.float32).tolist(),
+            metadatas=list(metadatas[start:end]) if metadatas is not None else None,
+        )
+
+
+class NumpyIndex:
+    """Exact top-k search over an embedding array, cosine or inner product.
+
+    `query` returns a dict shaped like Chroma's `Collection.query` result, so
+    it can stand in for a collection.
+    """
+
+    def __init__(self, embeddings: np.ndarray,
+                 metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+                 documents: Optional[Sequence[str]] = None,
+                 ids: Optional[Sequence[str]] = None,
+                 space: str = "cosine", block_size: int = 1024):
+        if space not in ("cosine", "ip"):
+            raise ValueError(f"Unknown space: {space}")
+        self.space = space
+        self.block_size = block_size
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        if space == "cosine":
+            # normalized once, a query is then one matmul
+            self.embeddings = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        self.metadatas = list(metadatas) if metadatas is not None else None
+        self.documents = list(documents) if documents is not None else None
+        self.ids = list(ids) if ids is not None else [str(i) for i in range(len(self.embeddings))]
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, query_embeddings: np.ndarray, k: int = 10):
+        """(distances, indices) of the `k` nearest rows per query, nearest first."""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if self.space == "cosine":
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        k = min(k, len(self.embeddings))
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        # only block_size x len(index) similarities are held at a time
+        for start in range(0, len(queries), self.block_size):
+            block = queries[start:start + self.block_size] @ self.embeddings.T
+            if k < block.shape[1]:
+                top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+            scores[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+        # same distances as Chroma's hnsw spaces
+        return 1 - scores, indices
+
+    def query(self, query_embeddings, n_results: int = 10,
+              include=("metadatas", "documents", "distances")) -> Dict[str, List]:
+        distances, indices = self.search(query_embeddings, n_results)
+        result = {"ids": [[self.ids[i] for i in row] for row in indices]}
+        if "distances" in include:
+            result["distances"] = distances.tolist()
+        if "metadatas" in include and self.metadatas is not None:
+            result["metadatas"] = [[self.metadatas[i] for i in row] for row in indices]
+        if "documents" in include and self.documents is not None:
+            result["documents"] = [[self.documents[i] for i in row] for row in indices]
+        return result
+
+
+def neighbour_label_probs(index, query_embeddings: np.ndarray, label: str,
+                          n_results: int = 10, batch_size: int = 512) -> np.ndarray:
+    """Share of the `n_results` nearest neighbours of each query with `label` set.
+
+    `index` is a Chroma collection or a `NumpyIndex`, queried with
+    `batch_size` embeddings per call.
+    """
+    probs = np.empty(len(query_embeddings), dtype=np.float64)
+    for start in range(0, len(query_embeddings), batch_size):
+        batch = np.asarray(query_embeddings[start:start + batch_size], dtype=np.float32)
+        results = index.query(query_embeddings=batch.tolist(), n_results=n_results,
+                              include=["metadatas"])
+        for row, neighbours in enumerate(results["metadatas"]):
+            probs[start + row] = sum(m[label] for m in neighbours) / len(neighbours)
+    return probs
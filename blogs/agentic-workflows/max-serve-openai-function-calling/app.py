@@ -1,17 +1,50 @@
-from typing import Dict, Any, Optional
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import os
-import requests
+import time
+import httpx
 from pydantic import BaseModel
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from openai import OpenAI
+from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
 from dotenv import load_dotenv
+from tools import ToolRegistry, follow_up_messages
 
 load_dotenv()
 
 WEATHER_API_KEY = os.getenv("WEATHERAPI_API_KEY")
+WEATHER_API_URL = os.getenv(
+    "WEATHER_API_URL", "http://api.weatherapi.com/v1/current.json"
+)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://0.0.0.0:8000/v1")
+# seconds a city's weather / air quality result is reused
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "300"))
+# seconds a single tool call may take before its result is reported as an error
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+
+client = AsyncOpenAI(base_url=LLM_BASE_URL, api_key="local")
+
+# one pooled client for every weather lookup, connections are kept alive
+# between requests instead of being opened per call
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(10.0),
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await http_client.aclose()
+    await client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,29 +53,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-client = OpenAI(base_url="http://0.0.0.0:8000/v1", api_key="local")
-
-
 class ChatRequest(BaseModel):
     message: str
 
 
+class ToolCallInfo(BaseModel):
+    name: str
+    arguments: Dict[str, Any]
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    latency_ms: float
+
+
 class ChatResponse(BaseModel):
     type: str
     message: str
     data: Optional[Dict[str, Any]] = None
+    tool_calls: Optional[List[ToolCallInfo]] = None
 
 
-def get_weather(city: str) -> Dict[str, Any]:
-    """Get weather data for a city"""
-    url = f"http://api.weatherapi.com/v1/current.json?key={WEATHER_API_KEY}&q={city}"
-    response = requests.get(url)
+class AsyncTTLCache:
+    """Caches results per key for `ttl` seconds.
+
+    Concurrent lookups of the same key share one in-flight fetch. Failed
+    fetches are not cached.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._values: OrderedDict = OrderedDict()
+        self._inflight: Dict[Any, asyncio.Future] = {}
+
+    async def get(self, key, fetch: Callable[[], Awaitable[Any]]):
+        entry = self._values.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._store(key, t))
+        # a cancelled caller must not cancel the fetch the others are waiting on
+        return await asyncio.shield(task)
+
+    def _store(self, key, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._values[key] = (time.monotonic() + self.ttl, task.result())
+        self._values.move_to_end(key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+
+tools = ToolRegistry(default_timeout=TOOL_TIMEOUT)
+weather_cache = AsyncTTLCache(WEATHER_CACHE_TTL)
+air_quality_cache = AsyncTTLCache(WEATHER_CACHE_TTL)
+
+
+async def fetch_current(city: str, error: str, **params) -> Dict[str, Any]:
+    response = await http_client.get(
+        WEATHER_API_URL, params={"key": WEATHER_API_KEY, "q": city, **params}
+    )
     if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code, detail="Weather API error"
-        )
+        raise HTTPException(status_code=response.status_code, detail=error)
+    return response.json()
 
-    data = response.json()
+
+@tools.register("Get current weather for a city", city="City name")
+async def get_weather(city: str) -> Dict[str, Any]:
+    """Get weather data for a city"""
+    return await weather_cache.get(city.strip().lower(), lambda: _get_weather(city))
+
+
+async def _get_weather(city: str) -> Dict[str, Any]:
+    data = await fetch_current(city, "Weather API error")
     return {
         "location": data["location"]["name"],
         "temperature": data["current"]["temp_c"],
@@ -50,16 +136,16 @@ def get_weather(city: str) -> Dict[str, Any]:
     }
 
 
-def get_air_quality(city: str) -> Dict[str, Any]:
+@tools.register("Get air quality for a city", city="City name")
+async def get_air_quality(city: str) -> Dict[str, Any]:
     """Get air quality data for a city"""
-    url = f"http://api.weatherapi.com/v1/current.json?key={WEATHER_API_KEY}&q={city}&aqi=yes"
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code, detail="Air quality API error"
-        )
+    return await air_quality_cache.get(
+        city.strip().lower(), lambda: _get_air_quality(city)
+    )
+
 
-    data = response.json()
+async def _get_air_quality(city: str) -> Dict[str, Any]:
+    data = await fetch_current(city, "Air quality API error", aqi="yes")
     aqi = data["current"].get("air_quality", {})
     return {
         "location": data["location"]["name"],
@@ -68,36 +154,7 @@ def get_air_quality(city: str) -> Dict[str, Any]:
     }
 
 
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_weather",
-            "description": "Get current weather for a city",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "city": {"type": "string", "description": "City name"},
-                },
-                "required": ["city"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_air_quality",
-            "description": "Get air quality for a city",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "city": {"type": "string", "description": "City name"},
-                },
-                "required": ["city"],
-            },
-        },
-    },
-]
+TOOLS = tools.schemas
 
 
 @app.get("/api/health")
@@ -105,18 +162,26 @@ def health_check():
     return {"status": "healthy"}
 
 
+RESPONSE_TYPES = {"get_weather": "weather", "get_air_quality": "air_quality"}
+
+
+def chat_messages(user_message: str) -> List[Dict[str, Any]]:
+    return [
+        {
+            "role": "system",
+            "content": "You are a weather assistant. Use the available functions to get weather and air quality data.",
+        },
+        {"role": "user", "content": user_message},
+    ]
+
+
 @app.post("/api/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     try:
-        response = client.chat.completions.create(
+        messages = chat_messages(request.message)
+        response = await client.chat.completions.create(
             model="modularai/llama-3.1",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a weather assistant. Use the available functions to get weather and air quality data.",
-                },
-                {"role": "user", "content": request.message},
-            ],
+            messages=messages,
             tools=TOOLS,
             tool_choice="auto",
         )
@@ -124,22 +189,32 @@ def chat(request: ChatRequest):
         message = response.choices[0].message
 
         if message.tool_calls:
-            tool_call = message.tool_calls[0]
-            function_name = tool_call.function.name
-            function_args = eval(tool_call.function.arguments)
-
-            if function_name == "get_weather":
-                data = get_weather(function_args["city"])
-                return ChatResponse(
-                    type="weather", message="Here's the weather data", data=data
+            # every tool call of the turn runs concurrently, then the model
+            # answers from all of the results in one follow-up turn
+            results = await tools.dispatch(message.tool_calls)
+            follow_up = await client.chat.completions.create(
+                model="modularai/llama-3.1",
+                messages=follow_up_messages(messages, message, results),
+            )
+            tool_calls = [
+                ToolCallInfo(
+                    name=r.name,
+                    arguments=r.arguments,
+                    data=r.content,
+                    error=r.error,
+                    latency_ms=r.latency_ms,
                 )
-            elif function_name == "get_air_quality":
-                data = get_air_quality(function_args["city"])
+                for r in results
+            ]
+            answer = follow_up.choices[0].message.content or ""
+            if len(results) == 1 and results[0].error is None:
                 return ChatResponse(
-                    type="air_quality", message="Here's the air quality data", data=data
+                    type=RESPONSE_TYPES[results[0].name],
+                    message=answer,
+                    data=results[0].content,
+                    tool_calls=tool_calls,
                 )
-            else:
-                raise HTTPException(status_code=400, detail="Unknown function call")
+            return ChatResponse(type="tools", message=answer, tool_calls=tool_calls)
 
         return ChatResponse(type="chat", message=message.content)
 
@@ -147,6 +222,108 @@ def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_completion(messages, **kwargs):
+    """Yield content deltas of a streamed completion, then the assembled message."""
+    stream = await client.chat.completions.create(
+        model="modularai/llama-3.1", messages=messages, stream=True, **kwargs
+    )
+    content = []
+    # tool calls arrive in fragments, keyed by their index in the message
+    calls: Dict[int, Dict[str, str]] = {}
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            yield delta.content
+        for fragment in delta.tool_calls or []:
+            call = calls.setdefault(
+                fragment.index, {"id": "", "name": "", "arguments": ""}
+            )
+            call["id"] = fragment.id or call["id"]
+            if fragment.function is not None:
+                call["name"] += fragment.function.name or ""
+                call["arguments"] += fragment.function.arguments or ""
+    tool_calls = [
+        ChatCompletionMessageToolCall(
+            id=call["id"] or f"call_{index}",
+            type="function",
+            function={"name": call["name"], "arguments": call["arguments"]},
+        )
+        for index, call in sorted(calls.items())
+    ]
+    yield ChatCompletionMessage(
+        role="assistant", content="".join(content), tool_calls=tool_calls or None
+    )
+
+
+async def chat_events(user_message: str):
+    start = time.perf_counter()
+    ttft_ms = None
+    num_tool_calls = 0
+
+    def elapsed_ms():
+        return (time.perf_counter() - start) * 1000
+
+    try:
+        messages = chat_messages(user_message)
+        async for item in stream_completion(messages, tools=TOOLS, tool_choice="auto"):
+            if isinstance(item, str):
+                ttft_ms = elapsed_ms() if ttft_ms is None else ttft_ms
+                yield sse("token", {"content": item})
+            else:
+                message = item
+
+        if message.tool_calls:
+            num_tool_calls = len(message.tool_calls)
+            # each result is sent as soon as its call finishes
+            results = []
+            async for result in tools.as_completed(message.tool_calls):
+                results.append(result)
+                yield sse(
+                    "tool",
+                    {
+                        "type": RESPONSE_TYPES.get(result.name, "tool"),
+                        "name": result.name,
+                        "arguments": result.arguments,
+                        "data": result.content,
+                        "error": result.error,
+                        "latency_ms": result.latency_ms,
+                    },
+                )
+            # the follow-up messages list the results in call order
+            order = {tc.id: i for i, tc in enumerate(message.tool_calls)}
+            results.sort(key=lambda r: order[r.id])
+            async for item in stream_completion(
+                follow_up_messages(messages, message, results)
+            ):
+                if isinstance(item, str):
+                    ttft_ms = elapsed_ms() if ttft_ms is None else ttft_ms
+                    yield sse("token", {"content": item})
+    except Exception as e:
+        yield sse("error", {"detail": str(e)})
+
+    yield sse(
+        "done",
+        {"ttft_ms": ttft_ms, "total_ms": elapsed_ms(), "tool_calls": num_tool_calls},
+    )
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Server-sent events: `token` deltas, `tool` results, then `done` with timings."""
+    return StreamingResponse(
+        chat_events(request.message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,177 @@
+"""Load generator for the `/api/chat` endpoints of `app.py`.
+
+With `--stubs`, the LLM and WeatherAPI are replaced by the local servers in
+`stub_servers.py` and the app is started against them, so the app's own
+scaling can be measured without a model or network access.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from stub_servers import add_stub_args, start_stubs
+
+MESSAGES = [
+    "What is the weather in Toronto?",
+    "What is the air quality in Vancouver?",
+    "What is the weather in Paris and Berlin?",
+    "Tell me a fun fact about the weather.",
+]
+
+
+async def chat(client, url, message, stream):
+    """Send one chat request, returns (latency, time to first token) in seconds."""
+    start = time.perf_counter()
+    if not stream:
+        response = await client.post(f"{url}/api/chat", json={"message": message})
+        response.raise_for_status()
+        return time.perf_counter() - start, None
+
+    ttft = None
+    event = None
+    async with client.stream(
+        "POST", f"{url}/api/chat/stream", json={"message": message}
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "token" and ttft is None:
+                    ttft = time.perf_counter() - start
+                elif event == "error":
+                    raise RuntimeError(json.loads(line[len("data: "):])["detail"])
+    return time.perf_counter() - start, ttft
+
+
+async def worker(client, args, deadline, results):
+    i = 0
+    while time.perf_counter() < deadline:
+        message = MESSAGES[i % len(MESSAGES)]
+        i += 1
+        try:
+            latency, ttft = await chat(client, args.url, message, args.stream)
+            results["latencies"].append(latency)
+            if ttft is not None:
+                results["ttfts"].append(ttft)
+        except Exception:
+            results["errors"] += 1
+
+
+async def run(args):
+    results = {"latencies": [], "ttfts": [], "errors": 0}
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        # one closed-loop client per unit of concurrency
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            *(worker(client, args, deadline, results) for _ in range(args.concurrency))
+        )
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(values.max())}
+
+
+def report(args, results, elapsed):
+    completed = len(results["latencies"])
+    total = completed + results["errors"]
+    summary = {
+        "endpoint": "/api/chat/stream" if args.stream else "/api/chat",
+        "concurrency": args.concurrency,
+        "requests": total,
+        "throughput_rps": completed / elapsed,
+        "error_rate": results["errors"] / total if total else 0.0,
+    }
+    if completed:
+        summary["latency_ms"] = percentiles(results["latencies"])
+    if results["ttfts"]:
+        summary["ttft_ms"] = percentiles(results["ttfts"])
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            value = "  ".join(f"{k}={v:.1f}" for k, v in value.items())
+        elif isinstance(value, float):
+            value = f"{value:.2f}"
+        print(f"{key:>15}: {value}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2))
+    return summary
+
+
+def start_app(args):
+    """Run app.py with uvicorn against the stub servers."""
+    env = dict(
+        os.environ,
+        LLM_BASE_URL=f"http://{args.host}:{args.llm_port}/v1",
+        WEATHER_API_URL=f"http://{args.host}:{args.weather_port}/v1/current.json",
+        WEATHERAPI_API_KEY="stub",
+        # every request should reach the weather stub
+        WEATHER_CACHE_TTL=str(args.cache_ttl),
+    )
+    port = args.url.rsplit(":", 1)[1]
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", args.host,
+         "--port", port, "--log-level", "warning"],
+        cwd=Path(__file__).parent, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{args.url}/api/health").status_code == 200:
+                return app
+        except httpx.TransportError:
+            pass
+        if app.poll() is not None:
+            raise SystemExit("app.py exited during startup")
+        time.sleep(0.2)
+    app.terminate()
+    raise SystemExit("app.py did not become healthy")
+
+
+def main(args):
+    servers, app = [], None
+    if args.stubs:
+        servers = start_stubs(args)
+        app = start_app(args)
+        print(f"Started app.py on {args.url}")
+    try:
+        results, elapsed = asyncio.run(run(args))
+        report(args, results, elapsed)
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait()
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for the function-calling app")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:8001", help="app.py endpoint")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per request, seconds")
+    parser.add_argument("--stream", action="store_true",
+                        help="use /api/chat/stream and report time to first token")
+    parser.add_argument("--json", type=str, default=None, help="write the summary to this file")
+    parser.add_argument("--stubs", action="store_true",
+                        help="start the stub LLM and weather servers and app.py against them")
+    parser.add_argument("--cache-ttl", type=float, default=0.0,
+                        help="WEATHER_CACHE_TTL of the app started with --stubs")
+    add_stub_args(parser)
+    main(parser.parse_args())
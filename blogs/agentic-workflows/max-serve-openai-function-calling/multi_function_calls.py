@@ -1,64 +1,40 @@
+import asyncio
 from openai import OpenAI
+from tools import ToolRegistry, follow_up_messages
 
 
 client = OpenAI(base_url="http://0.0.0.0:8000/v1", api_key="local")
+tools = ToolRegistry()
 
 
+@tools.register(
+    "Get current weather and forecast data for a city",
+    city="The city name to get weather for",
+)
 def get_weather(city: str) -> str:
     """Mock weather function that returns a simple response."""
     return f"The weather in {city} is sunny with a temperature of 72°F"
 
 
+@tools.register(
+    "Get air quality data for a city",
+    strict=True,
+    city="The city name to get air quality for",
+)
 def get_air_quality(city: str) -> str:
     """Mock air quality function that returns a simple response."""
     return f"The air quality in {city} is good with a PM2.5 of 10µg/m³"
 
 
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_weather",
-            "description": "Get current weather and forecast data for a city",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "city": {
-                        "type": "string",
-                        "description": "The city name to get weather for",
-                    }
-                },
-                "required": ["city"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_air_quality",
-            "description": "Get air quality data for a city",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "city": {
-                        "type": "string",
-                        "description": "The city name to get air quality for",
-                    }
-                },
-                "required": ["city"],
-                "additionalProperties": False,
-            },
-            "strict": True,
-        },
-    },
-]
+TOOLS = tools.schemas
 
 
 def llm_function_call(user_message: str) -> str:
     print("User message:", user_message)
+    messages = [{"role": "user", "content": user_message}]
     response = client.chat.completions.create(
         model="modularai/llama-3.1",
-        messages=[{"role": "user", "content": user_message}],
+        messages=messages,
         tools=TOOLS,
         tool_choice="auto",
     )
@@ -66,27 +42,28 @@ def llm_function_call(user_message: str) -> str:
     print("Output:", output)
     print("Tool calls:", output.tool_calls)
 
-    if output.tool_calls:
-        for tool_call in output.tool_calls:
-            if tool_call.function.name == "get_weather":
-                city = eval(tool_call.function.arguments)["city"]
-                weather_response = get_weather(city)
-                print("\nWeather response:", weather_response)
+    if not output.tool_calls:
+        return output.content
 
-            elif tool_call.function.name == "get_air_quality":
-                city = eval(tool_call.function.arguments)["city"]
-                air_quality_response = get_air_quality(city)
-                print("\nAir quality response:", air_quality_response)
-            else:
-                print(f"Unknown tool call: {tool_call.function.name}")
+    # all tool calls of the turn run concurrently
+    results = asyncio.run(tools.dispatch(output.tool_calls))
+    for result in results:
+        response_text = result.content if result.error is None else result.error
+        print(f"\n{result.name} response ({result.latency_ms:.1f} ms):", response_text)
 
-    return output.content
+    # the model answers from all tool results in one follow-up turn
+    follow_up = client.chat.completions.create(
+        model="modularai/llama-3.1",
+        messages=follow_up_messages(messages, output, results),
+    )
+    return follow_up.choices[0].message.content
 
 
 def main():
     user_messages = [
         "What's the weather like in San Francisco?",
         "What's the air quality like in San Francisco?",
+        "What's the weather and air quality like in San Francisco and Toronto?",
     ]
 
     for user_message in user_messages:
@@ -1,33 +1,21 @@
 from openai import OpenAI
+from tools import ToolRegistry
 
 
 client = OpenAI(base_url="http://0.0.0.0:8000/v1", api_key="local")
+tools = ToolRegistry()
 
 
+@tools.register(
+    "Get current weather and forecast data for a city",
+    city="The city name to get weather for",
+)
 def get_weather(city: str) -> str:
     """Mock weather function that returns a simple response."""
     return f"The weather in {city} is sunny with a temperature of 72°F"
 
 
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_weather",
-            "description": "Get current weather and forecast data for a city",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "city": {
-                        "type": "string",
-                        "description": "The city name to get weather for",
-                    }
-                },
-                "required": ["city"],
-            },
-        },
-    }
-]
+TOOLS = tools.schemas
 
 
 def main():
@@ -45,10 +33,8 @@ def main():
 
     if output.tool_calls:
         for tool_call in output.tool_calls:
-            if tool_call.function.name == "get_weather":
-                city = eval(tool_call.function.arguments)["city"]
-                weather_response = get_weather(city)
-                print("\nWeather response:", weather_response)
+            weather_response = tools.call(tool_call)
+            print("\nWeather response:", weather_response)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+"""Local stand-ins for MAX Serve's OpenAI-compatible API and for WeatherAPI.
+
+They let `app.py` run and be load tested without a model or network access:
+
+- the LLM stub answers `/v1/chat/completions`, streamed or not. A first turn
+  (a request with `tools`) returns the configured tool calls, one per tool for
+  every city named in the message. The follow-up turn after the tool results
+  returns a short text answer.
+- the weather stub answers `/v1/current.json` like WeatherAPI, with air
+  quality when `aqi=yes`.
+
+Both wait a configurable time per request to mimic generation and network
+latency.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ANSWER = "Here is what I found for you based on the latest available data."
+CITY_PATTERN = re.compile(r"\b(?:in|for|and)\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LLMHandler(StubHandler):
+    latency_ms = 200.0
+    token_latency_ms = 10.0
+    tool_names = ("get_weather",)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/v1/health", "/health"):
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        request = json.loads(body)
+        messages = request.get("messages", [])
+        tool_calls = []
+        if request.get("tools") and not any(m["role"] == "tool" for m in messages):
+            tool_calls = self._tool_calls(messages[-1]["content"], request["tools"])
+        time.sleep(self.latency_ms / 1000)
+        if request.get("stream"):
+            self._stream(request, tool_calls)
+            return
+
+        message = {"role": "assistant", "content": None if tool_calls else ANSWER}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        else:
+            # a non-streamed answer is sent once all of its tokens are generated
+            time.sleep(self.token_latency_ms * len(ANSWER.split()) / 1000)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+        })
+
+    def _tool_calls(self, user_message, tools):
+        available = {t["function"]["name"] for t in tools}
+        cities = CITY_PATTERN.findall(user_message) or ["Toronto"]
+        return [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps({"city": city})},
+            }
+            for city in cities
+            for name in self.tool_names
+            if name in available
+        ]
+
+    def _stream(self, request, tool_calls):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+        }
+
+        def send(delta, finish_reason=None):
+            chunk = dict(base, choices=[
+                {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            ])
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        if tool_calls:
+            for index, call in enumerate(tool_calls):
+                send({"role": "assistant", "tool_calls": [dict(call, index=index)]})
+            send({}, "tool_calls")
+        else:
+            for token in ANSWER.split(" "):
+                send({"role": "assistant", "content": token + " "})
+                time.sleep(self.token_latency_ms / 1000)
+            send({}, "stop")
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class WeatherHandler(StubHandler):
+    latency_ms = 50.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/v1/current.json":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        query = parse_qs(url.query)
+        city = query.get("q", ["Toronto"])[0]
+        time.sleep(self.latency_ms / 1000)
+        current = {"temp_c": 21.0, "condition": {"text": "Partly cloudy"}}
+        if query.get("aqi", ["no"])[0] == "yes":
+            current["air_quality"] = {"us-epa-index": 1, "pm2_5": 3.5}
+        self._send_json(200, {"location": {"name": city}, "current": current})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen backlog, room for hundreds of concurrent connections
+    request_queue_size = 1024
+
+
+def serve(handler, host, port):
+    """Start a stub server in a background thread and return it."""
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_llm(host="127.0.0.1", port=8000, latency_ms=200.0, token_latency_ms=10.0,
+              tool_names=("get_weather",)):
+    LLMHandler.latency_ms = latency_ms
+    LLMHandler.token_latency_ms = token_latency_ms
+    LLMHandler.tool_names = tuple(tool_names)
+    return serve(LLMHandler, host, port)
+
+
+def serve_weather(host="127.0.0.1", port=8002, latency_ms=50.0):
+    WeatherHandler.latency_ms = latency_ms
+    return serve(WeatherHandler, host, port)
+
+
+def add_stub_args(parser):
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=8000)
+    parser.add_argument("--weather-port", type=int, default=8002)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0,
+                        help="wait before each completion (time to first token)")
+    parser.add_argument("--token-latency-ms", type=float, default=10.0,
+                        help="wait between generated tokens")
+    parser.add_argument("--weather-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tool-calls", type=str, nargs="*", default=["get_weather"],
+                        help="tools the LLM stub calls for each city in the message, "
+                             "none for plain chat answers")
+
+
+def start_stubs(args):
+    servers = [
+        serve_llm(args.host, args.llm_port, args.llm_latency_ms,
+                  args.token_latency_ms, args.tool_calls),
+        serve_weather(args.host, args.weather_port, args.weather_latency_ms),
+    ]
+    print(f"LLM stub on http://{args.host}:{args.llm_port}/v1, "
+          f"weather stub on http://{args.host}:{args.weather_port}/v1/current.json")
+    return servers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub LLM and weather servers for app.py")
+    add_stub_args(parser)
+    args = parser.parse_args()
+    servers = start_stubs(args)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
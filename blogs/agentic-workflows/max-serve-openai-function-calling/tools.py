@@ -0,0 +1,228 @@
+"""Tool registry and concurrent execution of the tool calls of a chat completion.
+
+Functions registered with `ToolRegistry.register` get their `TOOLS` schema
+generated from their signature once, at import. Tool call arguments are parsed
+with `json.loads` and checked by a validator built once per tool.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union, get_args, get_origin, get_type_hints
+import asyncio
+import inspect
+import json
+import time
+
+# Python annotation -> JSON schema type, and the Python types each one accepts
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+PYTHON_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+}
+
+
+class ToolArgumentError(ValueError):
+    pass
+
+
+def _json_type(hint) -> Any:
+    """JSON schema type of an annotation, Optional[X] becomes [X, "null"]."""
+    if get_origin(hint) is Union:
+        args = [a for a in get_args(hint) if a is not type(None)]
+        if len(args) == 1 and len(args) < len(get_args(hint)):
+            return [JSON_TYPES[args[0]], "null"]
+    return JSON_TYPES[hint]
+
+
+def _split_type(json_type):
+    # ("string", False) for "string", ("string", True) for ["string", "null"]
+    types = json_type if isinstance(json_type, list) else [json_type]
+    non_null = [t for t in types if t != "null"]
+    return non_null[0], len(non_null) < len(types)
+
+
+@dataclass
+class ToolResult:
+    id: str
+    name: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    content: Any = None
+    error: Optional[str] = None
+    latency_ms: float = 0.0
+
+    def to_message(self) -> Dict[str, Any]:
+        """The `tool` message that feeds this result back to the model."""
+        content = {"error": self.error} if self.error is not None else self.content
+        return {
+            "role": "tool",
+            "tool_call_id": self.id,
+            "content": content if isinstance(content, str) else json.dumps(content),
+        }
+
+
+def compile_validator(name: str, parameters: Dict[str, Any]) -> Callable:
+    """Build the argument check for one tool from its parameters schema."""
+    properties = parameters["properties"]
+    required = frozenset(parameters.get("required", ()))
+    known = frozenset(properties)
+    allow_extra = parameters.get("additionalProperties", True)
+    checks = []
+    for key, p in properties.items():
+        json_type, nullable = _split_type(p["type"])
+        checks.append((key, json_type, PYTHON_TYPES[json_type], nullable))
+
+    def validate(arguments):
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError(f"{name}: arguments must be a JSON object")
+        missing = required - arguments.keys()
+        if missing:
+            raise ToolArgumentError(f"{name}: missing arguments {sorted(missing)}")
+        unknown = arguments.keys() - known
+        if unknown:
+            if not allow_extra:
+                raise ToolArgumentError(f"{name}: unknown arguments {sorted(unknown)}")
+            # the function can't take them, drop what the schema doesn't define
+            arguments = {k: v for k, v in arguments.items() if k in known}
+        for key, json_type, types, nullable in checks:
+            if key not in arguments:
+                continue
+            value = arguments[key]
+            if value is None:
+                if nullable:
+                    continue
+                raise ToolArgumentError(f"{name}: {key} must be a {json_type}, not null")
+            # bool is an int subclass, it only passes as a boolean
+            if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+                raise ToolArgumentError(f"{name}: {key} must be a {json_type}")
+        return arguments
+
+    return validate
+
+
+@dataclass
+class Tool:
+    name: str
+    fn: Callable
+    schema: Dict[str, Any]
+    validate: Callable
+    timeout: float
+
+    def parse(self, arguments: Optional[str]) -> Dict[str, Any]:
+        return self.validate(json.loads(arguments or "{}"))
+
+
+class ToolRegistry:
+    def __init__(self, default_timeout: float = 10.0):
+        self.default_timeout = default_timeout
+        self._tools: Dict[str, Tool] = {}
+        # the `tools` list sent with every completion request
+        self.schemas: List[Dict[str, Any]] = []
+
+    def register(
+        self,
+        description: str,
+        timeout: Optional[float] = None,
+        strict: bool = False,
+        **param_descriptions: str,
+    ):
+        """Decorator registering `fn` as a tool, parameters come from its signature."""
+
+        def decorator(fn):
+            hints = get_type_hints(fn)
+            properties, required = {}, []
+            for param in inspect.signature(fn).parameters.values():
+                prop = {"type": _json_type(hints.get(param.name, str))}
+                if param.name in param_descriptions:
+                    prop["description"] = param_descriptions[param.name]
+                properties[param.name] = prop
+                if param.default is inspect.Parameter.empty:
+                    required.append(param.name)
+            parameters = {
+                "type": "object",
+                "properties": properties,
+                "required": required,
+            }
+            if strict:
+                parameters["additionalProperties"] = False
+            function = {
+                "name": fn.__name__,
+                "description": description,
+                "parameters": parameters,
+            }
+            if strict:
+                function["strict"] = True
+            schema = {"type": "function", "function": function}
+            self._tools[fn.__name__] = Tool(
+                name=fn.__name__,
+                fn=fn,
+                schema=schema,
+                validate=compile_validator(fn.__name__, parameters),
+                timeout=timeout or self.default_timeout,
+            )
+            self.schemas.append(schema)
+            return fn
+
+        return decorator
+
+    def get(self, name: str) -> Tool:
+        tool = self._tools.get(name)
+        if tool is None:
+            raise ValueError(f"Unknown function call: {name}")
+        return tool
+
+    def call(self, tool_call) -> Any:
+        """Run one tool call synchronously (plain functions only)."""
+        tool = self.get(tool_call.function.name)
+        return tool.fn(**tool.parse(tool_call.function.arguments))
+
+    async def run(self, tool_call) -> ToolResult:
+        """Run one tool call. Errors and timeouts are returned in the result."""
+        result = ToolResult(id=tool_call.id, name=tool_call.function.name)
+        start = time.perf_counter()
+        timeout = self.default_timeout
+        try:
+            tool = self.get(result.name)
+            timeout = tool.timeout
+            result.arguments = tool.parse(tool_call.function.arguments)
+            if inspect.iscoroutinefunction(tool.fn):
+                call = tool.fn(**result.arguments)
+            else:
+                # plain functions run in a worker thread so they overlap as well
+                call = asyncio.to_thread(tool.fn, **result.arguments)
+            result.content = await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            result.error = f"{result.name} timed out after {timeout}s"
+        except Exception as e:
+            result.error = getattr(e, "detail", None) or str(e)
+        result.latency_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    async def dispatch(self, tool_calls) -> List[ToolResult]:
+        """Run all tool calls of a completion concurrently, results keep the call order."""
+        return await asyncio.gather(*(self.run(tc) for tc in tool_calls))
+
+    async def as_completed(self, tool_calls):
+        """Run all tool calls concurrently, yielding each result as soon as it is ready."""
+        for next_result in asyncio.as_completed([self.run(tc) for tc in tool_calls]):
+            yield await next_result
+
+
+def follow_up_messages(messages, message, results: List[ToolResult]) -> List[Dict]:
+    """`messages` extended with the assistant's tool calls and their results."""
+    assistant = {
+        "role": "assistant",
+        "content": message.content or "",
+        "tool_calls": [
+            {
+                "id": tc.id,
+                "type": "function",
+                "function": {
+                    "name": tc.function.name,
+                    "arguments": tc.function.arguments,
+                },
+            }
+            for tc in message.tool_calls
+        ],
+    }
+    return [*messages, assistant, *(r.to_message() for r in results)]
@@ -0,0 +1,252 @@
+"""Replay load generator for the `/chat` API of `ui.py`.
+
+Each client is one Gradio session that replays multi-turn conversations
+through `/chat` (and `/clear` between conversations), closed loop, for
+`--duration` seconds at every `--concurrency` level. Per turn it measures:
+
+- TTFT and end-to-end latency, as seen by the client
+- inter-token latency, (last update - first update) / tokens after the first
+  update. Tokens are counted by the UI with the model's tokenizer, and the UI
+  sends coalesced updates, so this is an average per turn
+- UI-side overhead, the client's TTFT and latency minus the backend's, as
+  measured by the UI itself (the TTFT and Tokens/s of the usage line)
+
+With `--stub`, `stub_server.py` stands in for MAX Serve and `ui.py` is
+started against it, so the UI process can be measured without a GPU.
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from gradio_client import Client
+
+CONVERSATIONS = [
+    [
+        "Hi! Can you help me plan a weekend trip to the mountains?",
+        "What should I pack for two days of hiking?",
+        "And what if it rains the whole time?",
+        "Thanks, can you summarize all of that as a checklist?",
+    ],
+    [
+        "Explain what a hash map is.",
+        "How does it handle collisions?",
+        "Write a tiny example in Python.",
+    ],
+    [
+        "What is the difference between latency and throughput?",
+        "Which one matters more for a chat application?",
+        "How would you measure both?",
+        "Give me three ways to improve the first one.",
+        "And the second one?",
+    ],
+]
+
+TOTAL_TOKENS = re.compile(r"\*\*Total Tokens Generated\*\*: (\d+)")
+BACKEND_TTFT = re.compile(r"\*\*TTFT\*\*: (\d+) ms")
+BACKEND_RATE = re.compile(r"\*\*Tokens/s\*\*: ([\d.]+)")
+
+
+def chat_turn(client, message, history, generated):
+    """Send one message, returns (history, generated tokens, measurements or None)."""
+    start = time.perf_counter()
+    first = last = None
+    first_tokens = 0
+    output = None
+    for output in client.submit(message, history, api_name="/chat"):
+        if output[0] and output[0][-1][1]:
+            last = time.perf_counter()
+            if first is None:
+                first = last
+                # tokens of the first update, they arrive with the TTFT
+                first_tokens = int(TOTAL_TOKENS.search(output[1]).group(1)) - generated
+    end = time.perf_counter()
+    history, usage = output
+    reply = history[-1][1] if history else None
+    # "⏳" is the not-ready notice, older UIs send it as a reply
+    if first is None or reply.startswith(("Error", "❌", "⏳")):
+        return history, generated, None
+
+    total = int(TOTAL_TOKENS.search(usage).group(1))
+    tokens = total - generated
+    turn = {"ttft": first - start, "latency": end - start, "tokens": tokens}
+    if tokens > first_tokens:
+        turn["itl"] = (last - first) / (tokens - first_tokens)
+    ttft = BACKEND_TTFT.search(usage)
+    if ttft:
+        backend_ttft = int(ttft.group(1)) / 1000
+        turn["ttft_overhead"] = turn["ttft"] - backend_ttft
+        rate = BACKEND_RATE.search(usage)
+        if rate and tokens > 1:
+            backend_latency = backend_ttft + (tokens - 1) / float(rate.group(1))
+            turn["latency_overhead"] = turn["latency"] - backend_latency
+    return history, total, turn
+
+
+def worker(args, conversations, offset, ready, deadline, results, lock):
+    client = Client(args.url, verbose=False)
+    # sessions are set up before the clock starts
+    ready.wait()
+    turns, errors, completed = [], 0, 0
+    i = offset
+    while time.perf_counter() < deadline["at"]:
+        client.predict(api_name="/clear")
+        history, generated = [], 0
+        for message in conversations[i % len(conversations)]:
+            if time.perf_counter() >= deadline["at"]:
+                break
+            try:
+                history, generated, turn = chat_turn(client, message, history, generated)
+            except Exception:
+                turn = None
+            if turn is None:
+                errors += 1
+                break
+            turns.append(turn)
+        else:
+            completed += 1
+        i += 1
+    client.close()
+    with lock:
+        results["turns"].extend(turns)
+        results["errors"] += errors
+        results["conversations"] += completed
+
+
+def run(args, conversations, concurrency):
+    results = {"turns": [], "errors": 0, "conversations": 0}
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    deadline = {"at": float("inf")}
+    threads = [
+        threading.Thread(target=worker,
+                         args=(args, conversations, k, ready, deadline, results, lock))
+        for k in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    deadline["at"] = start + args.duration
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(values.max())}
+
+
+def summarize(concurrency, results, elapsed):
+    turns = results["turns"]
+    total = len(turns) + results["errors"]
+    summary = {
+        "concurrency": concurrency,
+        "conversations": results["conversations"],
+        "turns": total,
+        "turns_per_sec": len(turns) / elapsed,
+        "tokens_per_sec": sum(t["tokens"] for t in turns) / elapsed,
+        "error_rate": results["errors"] / total if total else 0.0,
+    }
+    for key in ("ttft", "itl", "latency", "ttft_overhead", "latency_overhead"):
+        values = [t[key] for t in turns if key in t]
+        if values:
+            summary[f"{key}_ms"] = percentiles(values)
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            value = "  ".join(f"{k}={v:.1f}" for k, v in value.items())
+        elif isinstance(value, float):
+            value = f"{value:.2f}"
+        print(f"{key:>20}: {value}")
+    return summary
+
+
+def wait_until_ready(url, timeout=120):
+    """Wait for the UI to serve, then until /chat stops failing with the warming up status."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            client = Client(url, verbose=False)
+            history, _ = client.predict("ping", [], api_name="/chat")
+            client.close()
+            if not history[-1][1].startswith("⏳"):
+                return
+        except Exception:
+            pass
+        time.sleep(1)
+    raise SystemExit(f"{url} did not become ready")
+
+
+def start_ui(args):
+    """Run ui.py against the stub server."""
+    command = [
+        sys.executable, "ui.py",
+        "--base-url", f"http://127.0.0.1:{args.stub_port}/v1",
+        "--port", args.url.rstrip("/").rsplit(":", 1)[1],
+        "--concurrency-limit", str(args.ui_concurrency_limit or max(args.concurrency)),
+    ]
+    if args.tokenizer_path:
+        command += ["--tokenizer-path", args.tokenizer_path]
+    return subprocess.Popen(command, cwd=Path(__file__).parent)
+
+
+def main(args):
+    conversations = CONVERSATIONS
+    if args.conversations:
+        conversations = json.loads(Path(args.conversations).read_text())
+    server, ui = None, None
+    if args.stub:
+        from stub_server import serve
+        server = serve(port=args.stub_port, ttft_ms=args.ttft_ms,
+                       tokens_per_sec=args.tokens_per_sec, answer_tokens=args.answer_tokens,
+                       tokens_per_chunk=args.tokens_per_chunk)
+        ui = start_ui(args)
+        print(f"Started the stub server on port {args.stub_port} and ui.py on {args.url}")
+    try:
+        wait_until_ready(args.url)
+        summaries = []
+        for concurrency in args.concurrency:
+            print(f"\n--- {concurrency} concurrent conversations ---")
+            results, elapsed = run(args, conversations, concurrency)
+            summaries.append(summarize(concurrency, results, elapsed))
+        if args.json:
+            Path(args.json).write_text(json.dumps(summaries, indent=2))
+    finally:
+        if ui is not None:
+            ui.terminate()
+            ui.wait()
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay load test for the llama3-chat UI")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:7860", help="ui.py endpoint")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="concurrent conversations, one run per level")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per level")
+    parser.add_argument("--conversations", type=str, default=None,
+                        help="JSON file with a list of conversations, each a list of user messages")
+    parser.add_argument("--json", type=str, default=None, help="write the summaries to this file")
+    parser.add_argument("--stub", action="store_true",
+                        help="start stub_server.py and ui.py against it")
+    parser.add_argument("--stub-port", type=int, default=8000)
+    parser.add_argument("--ttft-ms", type=float, default=100.0, help="stub time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="stub token rate")
+    parser.add_argument("--answer-tokens", type=int, default=64, help="stub tokens per answer")
+    parser.add_argument("--tokens-per-chunk", type=int, default=1, help="stub tokens per streamed chunk")
+    parser.add_argument("--ui-concurrency-limit", type=int, default=None,
+                        help="--concurrency-limit of the ui.py started with --stub, "
+                             "defaults to the highest --concurrency")
+    parser.add_argument("--tokenizer-path", type=str, default=None,
+                        help="--tokenizer-path of the ui.py started with --stub")
+    main(parser.parse_args())
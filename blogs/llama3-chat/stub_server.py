@@ -0,0 +1,147 @@
+"""Stub OpenAI-compatible streaming server standing in for MAX Serve.
+
+It answers `/v1/chat/completions` with `--answer-tokens` tokens, common words
+that are one token each for Llama tokenizers. The first token comes after
+`--ttft-ms`, then `--tokens-per-sec` tokens per second, streamed
+`--tokens-per-chunk` at a time. With `stream_options.include_usage`, the last
+chunk reports the token counts like OpenAI. The chat UI can then be
+benchmarked without a GPU. `/v1/health` always answers 200.
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# one token each with leading space for the Llama 3 tokenizer
+WORDS = [" the", " of", " and", " to", " in", " is", " for", " on", " that", " with"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    ttft_ms = 100.0
+    tokens_per_sec = 50.0
+    answer_tokens = 64
+    tokens_per_chunk = 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path in ("/v1/health", "/health"):
+            self._send_json(200, {"status": "ok"})
+        elif path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        request = json.loads(body)
+        num_tokens = min(self.answer_tokens, request.get("max_tokens") or self.answer_tokens)
+        tokens = [WORDS[i % len(WORDS)] for i in range(num_tokens)]
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+        }
+        start = time.perf_counter()
+        interval = 1 / self.tokens_per_sec
+
+        def wait_for_token(i):
+            # token i is due at ttft + i * interval, independent of write time
+            delay = start + self.ttft_ms / 1000 + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        if not request.get("stream"):
+            wait_for_token(num_tokens - 1)
+            self._send_json(200, dict(base, object="chat.completion", choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }], usage=self._usage(num_tokens)))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, num_tokens, self.tokens_per_chunk):
+            content = "".join(tokens[i:i + self.tokens_per_chunk])
+            # a chunk is sent once its last token is due
+            wait_for_token(min(i + self.tokens_per_chunk, num_tokens) - 1)
+            self._write_event(dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"role": "assistant", "content": content}, "finish_reason": None}
+            ]))
+        self._write_event(dict(base, object="chat.completion.chunk", choices=[
+            {"index": 0, "delta": {}, "finish_reason": "stop"}
+        ]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_event(dict(base, object="chat.completion.chunk", choices=[],
+                                   usage=self._usage(num_tokens)))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _usage(self, completion_tokens):
+        # the stub doesn't tokenize the prompt
+        return {"prompt_tokens": 0, "completion_tokens": completion_tokens,
+                "total_tokens": completion_tokens}
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen backlog, room for many concurrent streams
+    request_queue_size = 1024
+
+
+def serve(host="127.0.0.1", port=8000, ttft_ms=100.0, tokens_per_sec=50.0, answer_tokens=64,
+          tokens_per_chunk=1):
+    """Start the stub server in a background thread and return it."""
+    StubHandler.ttft_ms = ttft_ms
+    StubHandler.tokens_per_sec = tokens_per_sec
+    StubHandler.answer_tokens = answer_tokens
+    StubHandler.tokens_per_chunk = tokens_per_chunk
+    server = StubServer((host, port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible streaming server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--ttft-ms", type=float, default=100.0, help="time to the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="rate of the following tokens")
+    parser.add_argument("--answer-tokens", type=int, default=64, help="tokens per answer")
+    parser.add_argument("--tokens-per-chunk", type=int, default=1, help="tokens per streamed chunk")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.ttft_ms, args.tokens_per_sec, args.answer_tokens,
+                   args.tokens_per_chunk)
+    print(f"Stub server on http://{args.host}:{args.port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
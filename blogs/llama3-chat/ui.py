@@ -1,20 +1,19 @@
 import os
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from typing import List, Dict
 import logging
 import json
+import threading
+import time
+import httpx
 import openai
 import requests
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_fixed,
-    retry_if_exception_type,
-    retry_if_result,
-)
 import gradio as gr
 from fastapi import FastAPI
 from gradio.routes import mount_gradio_app
-from transformers import AutoTokenizer
+from tokenizers import Tokenizer
 import click
 
 
@@ -24,183 +23,555 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def load_tokenizer(tokenizer_id: str, tokenizer_path: str = None) -> Tokenizer:
+    """Fast tokenizer from tokenizer.json: a local file, the HF cache or the Hub"""
+    if tokenizer_path is None:
+        from huggingface_hub import hf_hub_download, try_to_load_from_cache
+
+        cached = try_to_load_from_cache(tokenizer_id, "tokenizer.json")
+        # a cached file is used without contacting the Hub
+        tokenizer_path = cached if isinstance(cached, str) else hf_hub_download(
+            tokenizer_id, "tokenizer.json"
+        )
+    return Tokenizer.from_file(tokenizer_path)
+
 class ChatConfig:
-    def __init__(self, base_url: str, max_context_window: int):
+    def __init__(self, base_url: str, max_context_window: int, token_cache_size: int = 8192,
+                 update_interval_ms: float = 50, update_tokens: int = 16,
+                 tokenizer_path: str = None):
         self.base_url = base_url
+        # several MAX Serve replicas can be given as a comma separated list
+        self.base_urls = [url.strip() for url in base_url.split(",") if url.strip()]
         self.max_context_window = max_context_window
+        # streamed tokens are sent to the UI at most every update_interval_ms,
+        # or sooner once update_tokens tokens are waiting
+        self.update_interval = update_interval_ms / 1000
+        self.update_tokens = update_tokens
         self.model_repo_id = "modularai/llama-3.1"
         self.tokenizer_id = "meta-llama/Meta-Llama-3.1-8B-Instruct"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_id)
+        self.tokenizer_path = tokenizer_path
+        # loaded by warm_up, the UI serves a "warming up" state until both are set
+        self.tokenizer = None
+        self.tokenizer_loaded = threading.Event()
+        self.tokenizer_error = None  # last load failure, shown in the status until a retry succeeds
+        self.server_healthy = threading.Event()
+        # token count per formatted message, shared by all sessions (LRU)
+        self.token_cache_size = token_cache_size
+        self._token_cache = OrderedDict()
+
+    @property
+    def ready(self) -> bool:
+        return self.tokenizer_loaded.is_set() and self.server_healthy.is_set()
+
+    def status(self) -> str:
+        if self.ready:
+            return "🟢 Ready"
+        waiting = [
+            name for name, event in (
+                ("tokenizer", self.tokenizer_loaded), ("model server", self.server_healthy)
+            ) if not event.is_set()
+        ]
+        text = f"⏳ Model warming up, waiting for the {' and '.join(waiting)}..."
+        if self.tokenizer_error is not None:
+            text += f"\n\n🔴 Loading the tokenizer failed, retrying: {self.tokenizer_error}"
+        return text
+
+    def warm_up(self, backends: "BackendPool"):
+        """Load the tokenizer and start health checking the servers in the background"""
+        threading.Thread(target=self._load_tokenizer, daemon=True).start()
+        threading.Thread(target=backends.monitor, args=(self.server_healthy,), daemon=True).start()
+
+    def _load_tokenizer(self):
+        start = time.perf_counter()
+        delay = 1.0
+        while True:
+            try:
+                self.tokenizer = load_tokenizer(self.tokenizer_id, self.tokenizer_path)
+                break
+            except Exception as e:
+                self.tokenizer_error = f"{type(e).__name__}: {e}"
+                logger.error(f"Failed to load tokenizer {self.tokenizer_id}, retrying in {delay:.0f}s: {e}",
+                             exc_info=True)
+                # a Hub outage or a file still being copied can recover, back off to every minute
+                time.sleep(delay)
+                delay = min(delay * 2, 60.0)
+        self.tokenizer_error = None
+        self.tokenizer_loaded.set()
+        logger.info(f"Tokenizer loaded in {time.perf_counter() - start:.2f}s")
+
+    def message_tokens(self, messages: List[Dict]) -> List[int]:
+        """Token count of each message, only messages not seen before are tokenized"""
+        texts = [
+            f"<|im_start|>{message['role']}\n{message['content']}<|im_end|>\n"
+            for message in messages
+        ]
+        counts = [self._token_cache.get(text) for text in texts]
+        missing = list({text for text, count in zip(texts, counts) if count is None})
+        if missing:
+            # one batched call instead of one encode per message
+            encoded = self.tokenizer.encode_batch(missing)
+            new_counts = {text: len(encoding.ids) for text, encoding in zip(missing, encoded)}
+            counts = [new_counts.get(text, count) for text, count in zip(texts, counts)]
+            self._token_cache.update(new_counts)
+        for text in texts:
+            self._token_cache.move_to_end(text)
+        while len(self._token_cache) > self.token_cache_size:
+            self._token_cache.popitem(last=False)
+        return counts
 
     def count_tokens(self, messages: List[Dict]) -> int:
         """Count tokens for a list of messages using Llama tokenizer"""
-        num_tokens = 0
-        for message in messages:
-            text = f"<|im_start|>{message['role']}\n{message['content']}<|im_end|>\n"
-            num_tokens += len(self.tokenizer.encode(text))
-        return num_tokens
+        return sum(self.message_tokens(messages))
+
+class ContextWindow:
+    """Chooses the history turns sent with each message of one session.
+
+    Keeps cumulative token counts of the history turns. When the history no
+    longer fits, it is trimmed down to `keep_ratio` of the space left for it,
+    in one step. The first turn sent then stays the same for the next several
+    messages, so the prompt prefix is unchanged and the server's prefix cache
+    can reuse it.
+    """
+
+    def __init__(self, keep_ratio: float = 0.6):
+        self.keep_ratio = keep_ratio
+        self.cut = 0  # index of the first history turn that is sent
+        self.prefix_sums = [0]  # prefix_sums[i]: tokens of the first i turns
+
+    def reset(self):
+        self.cut = 0
+        self.prefix_sums = [0]
+
+    def select(self, pair_tokens: List[int], available: int) -> int:
+        """Index of the first turn to send, given `available` tokens for history"""
+        num_pairs = len(pair_tokens)
+        if num_pairs < len(self.prefix_sums) - 1:
+            # the history was cleared or replaced
+            self.reset()
+        for tokens in pair_tokens[len(self.prefix_sums) - 1:]:
+            self.prefix_sums.append(self.prefix_sums[-1] + tokens)
+
+        total = self.prefix_sums[num_pairs]
+        if total - self.prefix_sums[self.cut] > available:
+            # first turn that leaves at most keep_ratio * available tokens
+            target = total - max(available, 0) * self.keep_ratio
+            self.cut = min(bisect_left(self.prefix_sums, target, lo=self.cut), num_pairs)
+        return self.cut
+
+    def history_tokens(self, num_pairs: int) -> int:
+        return self.prefix_sums[num_pairs] - self.prefix_sums[self.cut]
+
+
+class SessionStats:
+    """Generation metrics of one session"""
+
+    def __init__(self):
+        self.generated_tokens = 0
+        self.ttft = None  # seconds, last response
+        self.tokens_per_sec = None  # last response
+
+    def usage(self, config: ChatConfig, active_context: int, streaming_tokens: int = 0) -> str:
+        text = (
+            f"**Total Tokens Generated**: {self.generated_tokens + streaming_tokens}"
+            f" | **Active Context**: {active_context}/{config.max_context_window}"
+        )
+        if self.ttft is not None:
+            text += f" | **TTFT**: {self.ttft * 1000:.0f} ms"
+        if self.tokens_per_sec is not None:
+            text += f" | **Tokens/s**: {self.tokens_per_sec:.1f}"
+        return text
+
 
 def is_not_healthy(response):
         return response.status_code != 200
 
-def wait_for_healthy(base_url: str):
-    @retry(
-        stop=stop_after_attempt(20),
-        wait=wait_fixed(60),
-        retry=(
-            retry_if_exception_type(requests.RequestException)
-            | retry_if_result(is_not_healthy)
-        ),
-        before_sleep=lambda retry_state: logger.info(
-            f"Waiting for server at {base_url} to start (attempt {retry_state.attempt_number}/20)..."
-        ),
-    )
-    def _check_health():
-        return requests.get(f"{base_url}/health", timeout=5)
-
-    return _check_health()
+def is_backend_failure(error: BaseException) -> bool:
+    """Errors that point at the server: 5xx responses, timeouts and connection errors.
+    Client errors (4xx), bad payloads and cancelled requests don't count against it."""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, httpx.TimeoutException, httpx.NetworkError,
+                              httpx.RemoteProtocolError, TimeoutError, ConnectionError))
 
-def create_interface(config: ChatConfig, client, system_prompt, concurrency_limit: int = 1):
+class Backend:
+    def __init__(self, base_url: str, client: openai.AsyncOpenAI):
+        self.base_url = base_url
+        self.client = client
+        self.healthy = False
+        self.outstanding = 0  # requests in flight
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.latency = None  # seconds per request, exponential moving average
+        self.ejected_until = 0.0  # time.monotonic() before which the monitor doesn't re-admit it
+
+    def check_health(self) -> bool:
+        try:
+            self.healthy = not is_not_healthy(requests.get(f"{self.base_url}/health", timeout=2))
+        except requests.RequestException:
+            self.healthy = False
+        return self.healthy
+
+class BackendRequest:
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        self.client = backend.client
+        # set when the response fails after the request was made, e.g. mid-stream
+        self.error = None
+
+class BackendPool:
+    """Routes each chat request to the healthy MAX server with the fewest requests in flight.
+
+    All backends share one pooled HTTP client. A backend is taken out of
+    rotation when its health check fails or after `eject_after_errors`
+    failed requests in a row, and is put back once its health check passes.
+    A backend ejected for failed requests sits out `eject_cooldown` seconds
+    first, whatever its health check says. Only server-side failures count
+    (`is_backend_failure`), and the last healthy backend is never ejected, so
+    a single server isn't turned away for a burst of errors.
+    """
+
+    def __init__(self, base_urls: List[str], api_key: str, max_connections: int = 256,
+                 eject_after_errors: int = 3, eject_cooldown: float = 30.0,
+                 health_interval: float = 5.0):
+        self.http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+        )
+        self.backends = [
+            Backend(url, openai.AsyncOpenAI(base_url=url, api_key=api_key,
+                                            http_client=self.http_client))
+            for url in base_urls
+        ]
+        self.eject_after_errors = eject_after_errors
+        self.eject_cooldown = eject_cooldown
+        self.health_interval = health_interval
+
+    def pick(self) -> Backend:
+        healthy = [backend for backend in self.backends if backend.healthy]
+        if not healthy:
+            raise RuntimeError("No healthy MAX server available")
+        # ties go to the backend that has been answering faster
+        return min(healthy, key=lambda b: (b.outstanding, b.latency or 0.0))
+
+    @asynccontextmanager
+    async def request(self):
+        """Yields a request on the chosen backend. It counts as failed if it raises
+        or its `error` is set with a server-side failure"""
+        request = BackendRequest(self.pick())
+        backend = request.backend
+        backend.outstanding += 1
+        backend.requests += 1
+        start = time.perf_counter()
+        try:
+            yield request
+        except Exception as e:
+            if is_backend_failure(e):
+                self.record_error(backend)
+            raise
+        else:
+            if request.error is not None:
+                if is_backend_failure(request.error):
+                    self.record_error(backend)
+            else:
+                backend.consecutive_errors = 0
+                elapsed = time.perf_counter() - start
+                backend.latency = elapsed if backend.latency is None else 0.8 * backend.latency + 0.2 * elapsed
+        finally:
+            backend.outstanding -= 1
+
+    def record_error(self, backend: Backend):
+        backend.errors += 1
+        backend.consecutive_errors += 1
+        if backend.consecutive_errors >= self.eject_after_errors and backend.healthy:
+            if not any(b.healthy for b in self.backends if b is not backend):
+                # ejecting the last one would leave the UI with no server at all
+                logger.warning(f"{backend.base_url} failed {backend.consecutive_errors} requests in a row, "
+                               "kept as the last healthy backend")
+                return
+            backend.healthy = False
+            backend.ejected_until = time.monotonic() + self.eject_cooldown
+            logger.warning(f"Ejecting {backend.base_url} for {self.eject_cooldown:.0f}s after "
+                           f"{backend.consecutive_errors} failed requests")
+
+    def monitor(self, any_healthy: threading.Event):
+        """Health check all backends forever, `any_healthy` is set while one is up"""
+        delay = 0.25
+        while True:
+            for backend in self.backends:
+                if time.monotonic() < backend.ejected_until and any(
+                    b.healthy for b in self.backends if b is not backend
+                ):
+                    # ejected for failing requests, a passing /health doesn't prove it serves them.
+                    # Without another healthy backend it may come back early
+                    continue
+                was_healthy = backend.healthy
+                # consecutive_errors is only reset by a successful request, so a backend
+                # re-admitted after its cooldown is ejected again by its next failure
+                if backend.check_health() != was_healthy:
+                    logger.info(f"MAX server at {backend.base_url} is {'healthy' if backend.healthy else 'unhealthy'}")
+            if any(backend.healthy for backend in self.backends):
+                any_healthy.set()
+            else:
+                any_healthy.clear()
+            if all(backend.healthy for backend in self.backends):
+                delay = 0.25
+                time.sleep(self.health_interval)
+            else:
+                # poll quickly while a server is starting, backing off to every 5 seconds
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+    def summary(self) -> str:
+        rows = [
+            "| Backend | Healthy | In flight | Requests | Errors | Latency |",
+            "|---|---|---|---|---|---|",
+        ]
+        for b in self.backends:
+            latency = f"{b.latency:.2f}s" if b.latency is not None else "-"
+            rows.append(f"| {b.base_url} | {'🟢' if b.healthy else '🔴'} | {b.outstanding} "
+                        f"| {b.requests} | {b.errors} | {latency} |")
+        return "\n".join(rows)
+
+def create_interface(config: ChatConfig, backends: BackendPool, system_prompt,
+                     concurrency_limit: int = 1, keep_ratio: float = 0.6):
     with gr.Blocks(theme="soft") as iface:
         gr.Markdown("# Chat with Llama 3 model\n\nPowered by Modular [MAX](https://docs.modular.com/max/) 🚀")
 
+        def status_text():
+            if len(backends.backends) == 1:
+                return config.status()
+            return f"{config.status()}\n\n{backends.summary()}"
+
+        status = gr.Markdown(status_text())
         chatbot = gr.Chatbot(height=400)
         msg = gr.Textbox(label="Message", placeholder="Type your message here...")
         clear = gr.Button("Clear")
 
         initial_usage = f"**Total Tokens Generated**: 0 | Context Window: {config.max_context_window}"
         token_display = gr.Markdown(initial_usage)
+        # per-session state (each session gets a copy), updated in place by respond
+        context = gr.State(ContextWindow(keep_ratio))
+        stats = gr.State(SessionStats())
 
-        async def respond_wrapped(message, chat_history):
-            async for response in respond(message, chat_history, config, client, system_prompt):
+        async def respond_wrapped(message, chat_history, context, stats):
+            async for response in respond(message, chat_history, config, backends, system_prompt,
+                                          context, stats):
                 yield response
 
         msg.submit(
             respond_wrapped,
-            [msg, chatbot],
+            [msg, chatbot, context, stats],
             [chatbot, token_display],
             api_name="chat"
-        ).then(lambda: "", None, msg)
+        ).success(lambda: "", None, msg)  # the message is kept when it couldn't be sent
 
         def clear_fn():
             return (
                 [],
-                f"**Total Tokens Generated**: 0 | Context Window: {config.max_context_window}"
+                f"**Total Tokens Generated**: 0 | Context Window: {config.max_context_window}",
+                ContextWindow(keep_ratio),
+                SessionStats(),
             )
 
         clear.click(
             clear_fn,
             None,
-            [chatbot, token_display],
+            [chatbot, token_display, context, stats],
             api_name="clear"
         )
 
+        # refresh the status until the model is ready, then stop polling.
+        # With several backends it keeps showing their load
+        def keep_polling():
+            return len(backends.backends) > 1 or not config.ready
+
+        status_timer = gr.Timer(1.0, active=keep_polling())
+        status_timer.tick(
+            lambda: (status_text(), gr.Timer(active=keep_polling())),
+            None,
+            [status, status_timer],
+            show_api=False,
+        )
+
         iface.queue(
             default_concurrency_limit=concurrency_limit,
         )
     return iface
 
-async def respond(message, chat_history, config: ChatConfig, client, system_prompt):
+async def respond(message, chat_history, config: ChatConfig, backends: BackendPool, system_prompt,
+                  context: ContextWindow = None, stats: SessionStats = None):
     chat_history = chat_history or []
+    context = context if context is not None else ContextWindow()
+    stats = stats if stats is not None else SessionStats()
 
     if not isinstance(message, str) or not message.strip():
-        yield chat_history, f"**Active Context**: 0/{config.max_context_window}"
+        yield chat_history, stats.usage(config, 0)
         return
 
+    if not config.ready:
+        # shown as a popup, a status reply in the history would be sent to the model next turn
+        raise gr.Error(config.status())
+
     messages = [system_prompt]
     current_message = {"role": "user", "content": message}
 
-    system_tokens = config.count_tokens([system_prompt])
-    base_tokens = system_tokens + config.count_tokens([current_message])
-    running_total = base_tokens
-
-    history_messages = []
-    if chat_history:
-        for user_msg, bot_msg in reversed(chat_history):
-            new_messages = [
-                {"role": "user", "content": user_msg},
-                {"role": "assistant", "content": bot_msg},
-            ]
-            history_tokens = config.count_tokens(new_messages)
-            if running_total + history_tokens <= config.max_context_window:
-                history_messages = new_messages + history_messages
-                running_total += history_tokens
-            else:
-                break
+    history_pairs = [
+        [
+            {"role": "user", "content": user_msg},
+            {"role": "assistant", "content": bot_msg},
+        ]
+        for user_msg, bot_msg in chat_history
+    ]
+    # counts for the whole conversation at once, earlier turns come from the cache
+    token_counts = config.message_tokens(
+        [system_prompt, current_message] + [m for pair in history_pairs for m in pair]
+    )
+    system_tokens, current_tokens = token_counts[:2]
+    pair_tokens = [
+        token_counts[2 + 2 * i] + token_counts[3 + 2 * i] for i in range(len(history_pairs))
+    ]
+    base_tokens = system_tokens + current_tokens
 
-    messages.extend(history_messages)
+    cut = context.select(pair_tokens, config.max_context_window - base_tokens)
+    running_total = base_tokens + context.history_tokens(len(history_pairs))
+
+    for pair in history_pairs[cut:]:
+        messages.extend(pair)
     messages.append(current_message)
 
     chat_history = chat_history + [[message, None]]
     bot_message = ""
+    parts = []
+    num_tokens = 0
 
     try:
-        response = await client.chat.completions.create(
-            model=config.model_repo_id,
-            messages=messages,
-            stream=True,
-            max_tokens=config.max_context_window,
-        )
+        start = time.perf_counter()
+        async with backends.request() as request:
+            response = await request.client.chat.completions.create(
+                model=config.model_repo_id,
+                messages=messages,
+                stream=True,
+                max_tokens=config.max_context_window,
+                # the last chunk then carries the exact completion token count
+                stream_options={"include_usage": True},
+            )
 
-        try:
-            async for chunk in response:
-                logger.debug(f"Received chunk: {chunk}")
-                content = chunk.choices[0].delta.content
-                if content is not None:
-                    bot_message += content
+            try:
+                first_token_at = None
+                first_tokens = 0
+                completion_tokens = None
+                last_update = start
+                pending = 0
+                async for chunk in response:
+                    logger.debug("Received chunk: %s", chunk)
+                    if chunk.usage is not None:
+                        completion_tokens = chunk.usage.completion_tokens
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        parts.append(content)
+                        now = time.perf_counter()
+                        if first_token_at is None:
+                            # only the first chunk is tokenized, it is excluded from tokens/s
+                            first_tokens = len(config.tokenizer.encode(content, add_special_tokens=False).ids)
+                            num_tokens = first_tokens
+                            first_token_at = now
+                            stats.ttft = now - start
+                        else:
+                            # live count is one per chunk, the exact count comes from usage at the end
+                            num_tokens += 1
+                            pending += 1
+                        if pending and now - last_update < config.update_interval and pending < config.update_tokens:
+                            continue
+                        last_update = now
+                        pending = 0
+                        bot_message = "".join(parts)
+                        chat_history[-1][1] = bot_message
+                        yield chat_history, stats.usage(config, running_total, num_tokens)
+
+                if first_token_at is not None:
+                    bot_message = "".join(parts)
+                    if completion_tokens is None:
+                        # no usage from the server, tokenize the whole answer once
+                        completion_tokens = len(config.tokenizer.encode(bot_message, add_special_tokens=False).ids)
+                    elapsed = time.perf_counter() - first_token_at
+                    # tokens after the first chunk, the first one is the TTFT
+                    if completion_tokens > first_tokens and elapsed > 0:
+                        stats.tokens_per_sec = (completion_tokens - first_tokens) / elapsed
+                    stats.generated_tokens += completion_tokens
+                    num_tokens = 0
+                    logger.debug("TTFT %.3fs, %.1f tokens/s", stats.ttft, stats.tokens_per_sec or 0)
                     chat_history[-1][1] = bot_message
-                    yield (
-                        chat_history,
-                        f"**Active Context**: {running_total}/{config.max_context_window}",
-                    )
-
-        except json.JSONDecodeError as je:
-            logger.error(f"JSON decode error in streaming response: {str(je)}", exc_info=True)
-            error_message = "Error: Invalid response format from server"
-            chat_history[-1][1] = error_message
-            yield chat_history, f"**Active Context**: {running_total}/{config.max_context_window}"
-
-        except Exception as stream_error:
-            logger.error(f"Error during response streaming: {str(stream_error)}", exc_info=True)
-            error_message = f"Error during chat: {str(stream_error)}"
-            chat_history[-1][1] = error_message
-            yield chat_history, f"**Active Context**: {running_total}/{config.max_context_window}"
+                    yield chat_history, stats.usage(config, running_total)
+
+            except json.JSONDecodeError as je:
+                logger.error(f"JSON decode error in streaming response: {str(je)}", exc_info=True)
+                request.error = je
+                error_message = "Error: Invalid response format from server"
+                chat_history[-1][1] = error_message
+                yield chat_history, stats.usage(config, running_total, num_tokens)
+
+            except Exception as stream_error:
+                logger.error(f"Error during response streaming: {str(stream_error)}", exc_info=True)
+                request.error = stream_error
+                error_message = f"Error during chat: {str(stream_error)}"
+                chat_history[-1][1] = error_message
+                yield chat_history, stats.usage(config, running_total, num_tokens)
 
     except Exception as e:
         logger.error(f"Error during chat completion: {str(e)}", exc_info=True)
         error_message = f"❌ Error starting chat: {str(e)}"
         gr.Error(error_message)
         chat_history[-1][1] = error_message
-        yield chat_history, f"**Active Context**: {running_total}/{config.max_context_window}"
+        yield chat_history, stats.usage(config, running_total, num_tokens)
+
+    # tokens of a response that failed part way
+    stats.generated_tokens += num_tokens
 
     # If we got no response at all
     if not bot_message:
         logger.warning("No response generated from the model")
         chat_history[-1][1] = "Error: No response generated"
-        yield chat_history, f"**Active Context**: {running_total}/{config.max_context_window}"
+        yield chat_history, stats.usage(config, running_total)
 
 
 @click.command()
-@click.option('--base-url', default=os.getenv('BASE_URL', 'http://0.0.0.0:8000/v1'))
+@click.option('--base-url', default=os.getenv('BASE_URL', 'http://0.0.0.0:8000/v1'),
+              help='MAX Serve endpoint, or a comma separated list of replicas')
 @click.option('--max-context-window', default=int(os.getenv('MAX_CONTEXT_WINDOW', 4096)))
 @click.option('--concurrency-limit', default=int(os.getenv('CONCURRENCY_LIMIT', 1)))
 @click.option('--system-prompt', default=os.getenv('SYSTEM_PROMPT', 'You are a helpful AI assistant.'))
 @click.option('--port', default=int(os.getenv('PORT', 7860)))
 @click.option('--api-key', default=os.getenv('API_KEY', 'test'))
-def main(base_url, max_context_window, concurrency_limit, system_prompt, port, api_key):
+@click.option('--context-keep-ratio', default=float(os.getenv('CONTEXT_KEEP_RATIO', 0.6)),
+              help='Share of the history budget kept when old turns are dropped')
+@click.option('--update-interval-ms', default=float(os.getenv('UPDATE_INTERVAL_MS', 50)),
+              help='Minimum time between UI updates while streaming')
+@click.option('--update-tokens', default=int(os.getenv('UPDATE_TOKENS', 16)),
+              help='Send a UI update once this many tokens are waiting')
+@click.option('--tokenizer-path', default=os.getenv('TOKENIZER_PATH'),
+              help='Local tokenizer.json, defaults to the Hugging Face cache or Hub')
+@click.option('--max-connections', default=int(os.getenv('MAX_CONNECTIONS', 256)),
+              help='Size of the HTTP connection pool shared by all sessions')
+def main(base_url, max_context_window, concurrency_limit, system_prompt, port, api_key,
+         context_keep_ratio, update_interval_ms, update_tokens, tokenizer_path, max_connections):
     """Launch the Llama Chat interface"""
     logger.info(f"Initializing chat interface with base_url={base_url}, max_context_window={max_context_window}")
-    config = ChatConfig(base_url, max_context_window)
+    config = ChatConfig(base_url, max_context_window, update_interval_ms=update_interval_ms,
+                        update_tokens=update_tokens, tokenizer_path=tokenizer_path)
     system_prompt = {
         "role": "system",
         "content": system_prompt
     }
-    wait_for_healthy(base_url)
-    logger.info("MAX server is healthy and ready to process requests")
-
-    client = openai.AsyncOpenAI(base_url=config.base_url, api_key=api_key)
+    # the UI starts right away and shows a warming up state until both are done
+    backends = BackendPool(config.base_urls, api_key, max_connections=max_connections)
+    config.warm_up(backends)
 
-    iface = create_interface(config, client, system_prompt, concurrency_limit)
+    iface = create_interface(config, backends, system_prompt, concurrency_limit,
+                             context_keep_ratio)
 
     app = FastAPI()
     mount_gradio_app(app=app, blocks=iface, path="/")
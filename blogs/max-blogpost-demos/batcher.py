@@ -0,0 +1,125 @@
+"""Dynamic micro-batching in front of a MAX Engine model.
+
+Many threads call `MicroBatcher.predict(img)` (or `submit`) concurrently. A
+single worker thread drains the request queue into batches of up to
+`max_batch_size` images, waiting at most `max_wait_ms` after the first image of
+a batch arrives, runs the model once per batch and hands every caller its own
+row of the output.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def _resolve(future, result=None, exception=None):
+    # a future that rejects its result (e.g. already done) must not stop the worker
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except Exception:
+        pass
+
+
+class MicroBatcher:
+    def __init__(self, execute_fn, input_shape, max_batch_size=16, max_wait_ms=5.0,
+                 dtype=np.float32):
+        """`execute_fn(batch)` takes an array of shape (n, *input_shape) and
+        returns an array whose first dimension is n."""
+        self.execute_fn = execute_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # reused for every batch, only the first n rows are passed to the model
+        self._buffer = np.empty((max_batch_size, *input_shape), dtype=dtype)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        # makes "not closed, then queued" atomic against close()
+        self._submit_lock = threading.Lock()
+        self.batch_sizes = []
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, img):
+        future = Future()
+        with self._submit_lock:
+            if self._stop.is_set():
+                future.set_exception(RuntimeError("MicroBatcher is closed"))
+            else:
+                self._queue.put((img, future))
+        return future
+
+    def predict(self, img, timeout=None):
+        return self.submit(img).result(timeout)
+
+    def close(self):
+        with self._submit_lock:
+            self._stop.set()
+        self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            # an image that doesn't fit the buffer only fails its own caller
+            accepted = []
+            for img, future in batch:
+                # cancelled by its caller, not run. Otherwise it can't be cancelled anymore
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self._buffer[len(accepted)] = img
+                except Exception as e:
+                    _resolve(future, exception=e)
+                else:
+                    accepted.append((img, future))
+            batch = accepted
+            n = len(batch)
+            if not n:
+                continue
+            self.batch_sizes.append(n)
+            try:
+                outputs = self.execute_fn(self._buffer[:n])
+                if len(outputs) != n:
+                    raise ValueError(f"execute_fn returned {len(outputs)} rows for a batch of {n}")
+            except Exception as e:
+                for _, future in batch:
+                    _resolve(future, exception=e)
+                continue
+            for i, (_, future) in enumerate(batch):
+                _resolve(future, outputs[i])
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            _resolve(future, exception=RuntimeError("MicroBatcher is closed"))
@@ -0,0 +1,64 @@
+import argparse
+import threading
+import time
+import numpy as np
+from batcher import MicroBatcher
+from resnet50_models import INPUT_SHAPE, load_max_resnet50, simulated_model
+
+### Load generator ###
+def run_load(batcher, concurrency, duration):
+   # each caller sends its next image as soon as the previous prediction returns
+   img = np.random.rand(*INPUT_SHAPE).astype(np.float32)
+   latencies = [[] for _ in range(concurrency)]
+   errors = [0] * concurrency
+   stop_at = time.perf_counter() + duration
+
+   def caller(i):
+      while time.perf_counter() < stop_at:
+         start = time.perf_counter()
+         try:
+            batcher.predict(img, timeout=60)
+         except Exception:
+            errors[i] += 1
+            continue
+         latencies[i].append(time.perf_counter() - start)
+
+   threads = [threading.Thread(target=caller, args=(i,)) for i in range(concurrency)]
+   start = time.perf_counter()
+   for t in threads:
+      t.start()
+   for t in threads:
+      t.join()
+   elapsed = time.perf_counter() - start
+   return np.concatenate([np.asarray(l) for l in latencies]) * 1000, sum(errors), elapsed
+
+def main(args):
+   if args.simulate:
+      execute_fn = simulated_model(args.fixed_ms, args.per_image_ms)
+   else:
+      execute_fn = load_max_resnet50()
+      execute_fn(np.zeros((1, *INPUT_SHAPE), dtype=np.float32))  # warm up
+
+   print(f"{'batch':>5} {'wait_ms':>7} {'callers':>7} {'req/s':>8} {'avg_bs':>6} "
+         f"{'p50_ms':>7} {'p95_ms':>7} {'p99_ms':>7} {'errors':>6}")
+   for max_batch_size in args.batch_sizes:
+      for max_wait_ms in args.wait_ms:
+         with MicroBatcher(execute_fn, INPUT_SHAPE, max_batch_size, max_wait_ms) as batcher:
+            lat, errors, elapsed = run_load(batcher, args.concurrency, args.duration)
+            sizes = batcher.batch_sizes
+         p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (np.nan,) * 3
+         print(f"{max_batch_size:>5} {max_wait_ms:>7.1f} {args.concurrency:>7} "
+               f"{len(lat) / elapsed:>8.1f} {np.mean(sizes) if sizes else 0:>6.1f} "
+               f"{p50:>7.1f} {p95:>7.1f} {p99:>7.1f} {errors:>6}")
+
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description='Micro-batching load test for MAX ResNet50')
+   parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+   parser.add_argument('--wait-ms', type=float, nargs='+', default=[1.0, 5.0, 10.0])
+   parser.add_argument('--concurrency', type=int, default=32, help='concurrent callers')
+   parser.add_argument('--duration', type=float, default=10.0, help='seconds per setting')
+   parser.add_argument('--simulate', action='store_true',
+                       help='use a simulated model instead of MAX Engine')
+   parser.add_argument('--fixed-ms', type=float, default=5.0, help='simulated per-batch cost')
+   parser.add_argument('--per-image-ms', type=float, default=1.0, help='simulated per-image cost')
+   main(parser.parse_args())
@@ -0,0 +1,54 @@
+import argparse
+import numpy as np
+from benchmark import benchmark, plot_results, save_results
+from resnet50_models import INPUT_SHAPE, load_max_resnet50, simulated_model
+
+def main(args):
+   rng = np.random.default_rng(0)
+   # one preprocessed-looking pool, batches are sliced from it outside the timed region
+   pool = rng.uniform(-124, 152, size=(max(args.batch_sizes), *INPUT_SHAPE)).astype(np.float32)
+
+   def make_inputs(batch_size):
+      return pool[:batch_size]
+
+   if args.simulate:
+      model_fn = simulated_model(args.fixed_ms, args.per_image_ms)
+      set_threads = None
+   else:
+      # with --threads every thread count loads its own session, the default one isn't needed
+      model_fn = load_max_resnet50() if None in args.threads else None
+      set_threads = load_max_resnet50
+
+   results = benchmark(model_fn, make_inputs, args.batch_sizes, threads=args.threads,
+                       set_threads=set_threads, name='MAX Engine ResNet50',
+                       warmup=args.warmup, iterations=args.iterations, min_time=args.min_time)
+
+   print(f"{'threads':>7} {'batch':>5} {'p50_ms':>8} {'p90_ms':>8} {'p99_ms':>8} "
+         f"{'ci95_ms':>17} {'img/s':>8}")
+   for run in results['runs']:
+      lat = run['latency_ms']
+      ci = f"{lat['ci95_low']:.1f}-{lat['ci95_high']:.1f}"
+      print(f"{str(run['threads'] or '-'):>7} {run['batch_size']:>5} {lat['p50']:>8.1f} "
+            f"{lat['p90']:>8.1f} {lat['p99']:>8.1f} {ci:>17} {run['throughput']:>8.1f}")
+   if args.json:
+      save_results(results, args.json)
+   if args.plot:
+      import matplotlib.pyplot as plt
+      plot_results([results], title='ResNet50 batch size vs median latency')
+      plt.savefig(args.plot)
+
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description='Latency and throughput of MAX ResNet50 per batch size')
+   parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+   parser.add_argument('--threads', type=int, nargs='+', default=[None],
+                       help='session thread counts, the engine default when omitted')
+   parser.add_argument('--warmup', type=int, default=3, help='untimed runs per setting')
+   parser.add_argument('--iterations', type=int, default=20, help='minimum timed runs per setting')
+   parser.add_argument('--min-time', type=float, default=1.0, help='minimum seconds per setting')
+   parser.add_argument('--json', type=str, help='save the results to this JSON file')
+   parser.add_argument('--plot', type=str, help='save the latency plot to this image file')
+   parser.add_argument('--simulate', action='store_true',
+                       help='use a simulated model instead of MAX Engine')
+   parser.add_argument('--fixed-ms', type=float, default=5.0, help='simulated per-batch cost')
+   parser.add_argument('--per-image-ms', type=float, default=1.0, help='simulated per-image cost')
+   main(parser.parse_args())
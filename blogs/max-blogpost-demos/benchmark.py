@@ -0,0 +1,168 @@
+"""Inference benchmark for any model callable.
+
+`benchmark` times a model over batch sizes and thread counts. Inputs come from
+`make_inputs(batch_size)`, called outside the timed region, so data loading is
+never measured. The optional `prepare` step (e.g. NumPy -> torch tensors or a
+host-to-device copy) is timed on its own, so conversion cost is reported
+apart from compute. Each configuration is warmed up, then run for at least
+`iterations` runs and `min_time` seconds, with the garbage collector off while
+timing.
+
+Results are plain dicts. `save_results` writes them as JSON, and
+`plot_results` plots one or more saved runs:
+
+    results = benchmark(lambda **kw: maxmodel.execute(**kw), make_inputs, [1, 8, 32], name="MAX")
+    save_results(results, "max.json")
+    plot_results(["max.json", "pytorch.json"])
+
+The same file is in `2403-semantic-search-with-max-engine` and
+`max-blogpost-demos`. Each blog folder is used on its own, so keep the two
+copies identical.
+"""
+
+import gc
+import json
+import os
+import platform
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+def _call(fn, inputs):
+    return fn(**inputs) if isinstance(inputs, dict) else fn(inputs)
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Distribution of `samples` (seconds) in milliseconds.
+
+    `ci95_low`/`ci95_high` is a distribution-free 95% confidence interval of
+    the median, from the order statistics. Latencies are skewed, so no normal
+    distribution is assumed.
+    """
+    values = np.sort(np.asarray(samples, dtype=np.float64) * 1000)
+    n = len(values)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    half_width = 1.96 * np.sqrt(n) / 2
+    low = values[max(int(np.floor(n / 2 - half_width)), 0)]
+    high = values[min(int(np.ceil(n / 2 + half_width)), n - 1)]
+    return {
+        "mean": float(values.mean()), "std": float(values.std(ddof=1)) if n > 1 else 0.0,
+        "min": float(values[0]), "p50": float(p50), "p90": float(p90), "p99": float(p99),
+        "max": float(values[-1]), "ci95_low": float(low), "ci95_high": float(high),
+        "samples": n,
+    }
+
+
+def measure(model_fn: Callable, make_inputs: Callable, batch_size: int,
+            prepare: Optional[Callable] = None, sync: Optional[Callable] = None,
+            warmup: int = 3, iterations: int = 20, min_time: float = 1.0) -> Dict[str, Any]:
+    """Latency distribution of `model_fn` for one batch size."""
+    for _ in range(warmup):
+        inputs = make_inputs(batch_size)
+        _call(model_fn, prepare(inputs) if prepare else inputs)
+        if sync:
+            sync()
+
+    compute, transfer = [], []
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        while len(compute) < iterations or time.perf_counter() - start < min_time:
+            inputs = make_inputs(batch_size)
+            if prepare:
+                t0 = time.perf_counter()
+                inputs = prepare(inputs)
+                if sync:
+                    sync()
+                transfer.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            _call(model_fn, inputs)
+            if sync:
+                sync()
+            compute.append(time.perf_counter() - t0)
+    finally:
+        gc.enable()
+
+    latency = summarize(compute)
+    result = {
+        "batch_size": batch_size,
+        "latency_ms": latency,
+        "throughput": batch_size * 1000 / latency["p50"],
+    }
+    if transfer:
+        result["transfer_ms"] = summarize(transfer)
+    return result
+
+
+def benchmark(model_fn: Callable, make_inputs: Callable, batch_sizes: Iterable[int],
+              threads: Iterable[Optional[int]] = (None,),
+              set_threads: Optional[Callable[[int], Optional[Callable]]] = None,
+              name: str = "model", **measure_args) -> Dict[str, Any]:
+    """Run `measure` for every thread count and batch size.
+
+    `set_threads(n)` is called before each thread count. It can set a global
+    (e.g. `torch.set_num_threads`) or return a new `model_fn`, e.g. a MAX
+    or ONNX Runtime session created with `n` threads. `None` in `threads`
+    keeps the runtime's default.
+    """
+    runs = []
+    for n in threads:
+        if n is not None and set_threads is not None:
+            model_fn = set_threads(n) or model_fn
+        for batch_size in batch_sizes:
+            run = measure(model_fn, make_inputs, batch_size, **measure_args)
+            run["threads"] = n
+            runs.append(run)
+    return {
+        "name": name,
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "runs": runs,
+    }
+
+
+def save_results(results: Dict[str, Any], path):
+    Path(path).write_text(json.dumps(results, indent=2))
+
+
+def load_results(path) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text())
+
+
+def plot_results(results: List, metric: str = "p50", threads: Optional[int] = None,
+                 title: str = "Batch size vs latency", ax=None):
+    """Latency per batch size of each result (a dict or a JSON path), with the median's 95% CI."""
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        _, ax = plt.subplots(figsize=(10, 6))
+    for res in results:
+        if not isinstance(res, dict):
+            res = load_results(res)
+        runs = [r for r in res["runs"] if threads is None or r["threads"] == threads]
+        labels = sorted({r["threads"] for r in runs}, key=lambda n: -1 if n is None else n)
+        for n in labels:
+            group = [r for r in runs if r["threads"] == n]
+            x = [r["batch_size"] for r in group]
+            y = [r["latency_ms"][metric] for r in group]
+            yerr = None
+            if metric == "p50":
+                yerr = [[r["latency_ms"]["p50"] - r["latency_ms"]["ci95_low"] for r in group],
+                        [r["latency_ms"]["ci95_high"] - r["latency_ms"]["p50"] for r in group]]
+            label = res["name"] if len(labels) == 1 else f"{res['name']} ({n} threads)"
+            ax.errorbar(x, y, yerr=yerr, fmt="-o", capsize=5, label=label)
+    ax.set_xscale("log", base=2)
+    ax.set_xlabel("Batch Size")
+    ax.set_ylabel(f"{metric} latency (ms)")
+    ax.set_title(title)
+    ax.legend()
+    ax.grid(True)
+    return ax
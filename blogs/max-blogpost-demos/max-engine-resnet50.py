@@ -1,14 +1,37 @@
 
+import logging
 import shutil
-import tensorflow as tf
+import time
+from importlib.metadata import PackageNotFoundError, version
 import numpy as np
-from tensorflow.keras.applications.resnet50 import ResNet50
 from PIL import Image
+from model_cache import ModelCache, export_if_changed
+from preprocessing import BatchPreprocessor, decode_predictions
 
-def load_save_resnet50_model(saved_model_dir = 'resnet50_saved_model'):
+logging.basicConfig(level=logging.INFO)
+startup_start = time.perf_counter()
+
+def tensorflow_version():
+   # the metadata lookup avoids importing TensorFlow, whose package name varies
+   for dist in ('tensorflow', 'tensorflow-cpu', 'tensorflow-macos', 'tensorflow-intel'):
+      try:
+         return version(dist)
+      except PackageNotFoundError:
+         pass
+   import tensorflow as tf
+   return tf.__version__
+
+def save_resnet50_model(saved_model_dir):
+   # TensorFlow is only needed (and imported) when the model has to be exported
+   from tensorflow.keras.applications.resnet50 import ResNet50
    model = ResNet50(weights='imagenet')
    shutil.rmtree(saved_model_dir, ignore_errors=True)
-   model.save(saved_model_dir, include_optimizer=False, save_format='tf')
+   model.save(str(saved_model_dir), include_optimizer=False, save_format='tf')
+
+def load_save_resnet50_model(saved_model_dir = 'resnet50_saved_model'):
+   # Only download and re-export when the SavedModel is missing or stale
+   source = {'model': 'keras.applications.ResNet50', 'weights': 'imagenet', 'tf': tensorflow_version()}
+   export_if_changed(saved_model_dir, save_resnet50_model, source)
 saved_model_dir = 'resnet50_saved_model'
 load_save_resnet50_model(saved_model_dir)
 
@@ -16,14 +39,14 @@ load_save_resnet50_model(saved_model_dir)
 ### MAX Engine Python API ###
 from max import engine
 sess = engine.InferenceSession()
-model = sess.load('resnet50_saved_model')
+model = ModelCache(sess).load(saved_model_dir)
 #============================================#
+print(f"Startup time: {time.perf_counter() - startup_start:.2f}s")
+
+preprocessor = BatchPreprocessor(mode='caffe')
 
 def image_preprocess(img, reps=1):
-   img = np.asarray(img.resize((224, 224)))
-   img = np.stack([img]*reps)
-   img = tf.keras.applications.resnet50.preprocess_input(img)
-   return img
+   return preprocessor.replicate(img, reps)
 
 img= Image.open('max/examples/inference/resnet50-python-tensorflow/input/leatherback_turtle.jpg')
 img = image_preprocess(img)
@@ -34,4 +57,4 @@ outputs = model.execute(input_1=img)
 #============================================#
 
 probs = np.array(outputs['predictions'][0])
-print(tf.keras.applications.resnet.decode_predictions(np.expand_dims(probs, axis=0), top=5))
\ No newline at end of file
+print(decode_predictions(probs, top=5))
\ No newline at end of file
@@ -0,0 +1,19 @@
+import time
+import numpy as np
+
+INPUT_SHAPE = (224, 224, 3)
+
+def load_max_resnet50(num_threads=None, saved_model_dir='resnet50_saved_model'):
+   from max import engine
+   from model_cache import ModelCache
+   # the session's thread count is fixed when it is created
+   session = engine.InferenceSession() if num_threads is None else engine.InferenceSession(num_threads=num_threads)
+   model = ModelCache(session).load(saved_model_dir)
+   return lambda batch: model.execute(input_1=batch)['predictions']
+
+def simulated_model(fixed_ms, per_image_ms):
+   # stand-in with the cost profile of a batched model: fixed overhead + per image cost
+   def execute(batch):
+      time.sleep((fixed_ms + per_image_ms * len(batch)) / 1000)
+      return np.zeros((len(batch), 1000), dtype=np.float32)
+   return execute
@@ -0,0 +1,157 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from preprocessing import MODEL_MODES, BatchPreprocessor
+from triton_session import TRANSPORTS, TritonSession
+
+INPUT_NAMES = {"resnet50": "input_1", "efficientnet": "input_2"}
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+### Inputs ###
+def load_inputs(model_name, image_dir, count=16):
+    # everything is preprocessed up front so only the requests are timed
+    preprocessor = BatchPreprocessor(mode=MODEL_MODES.get(model_name, "none"))
+    if image_dir:
+        paths = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not paths:
+            raise SystemExit(f"No images found in {image_dir}")
+        return [preprocessor([Image.open(p)]).copy() for p in paths]
+    print("No --images given, using random inputs")
+    return [np.random.uniform(-120, 150, (1, 224, 224, 3)).astype(np.float32)
+            for _ in range(count)]
+
+### Load generation ###
+def worker(args, inputs, schedule, clock, ready, go, results, lock):
+    session = TritonSession(args.url, args.model, INPUT_NAMES.get(args.model, "input_2"),
+                            (1, 224, 224, 3), transport=args.transport, grpc_url=args.grpc_url)
+    # connections are set up before the clock starts
+    ready.wait()
+    go.wait()
+    deadline = clock['deadline']
+    latencies, errors = [], 0
+    i = 0
+    while True:
+        if schedule is None:
+            # closed loop: send the next request as soon as the previous one returns
+            if time.perf_counter() >= deadline:
+                break
+            sent_at = time.perf_counter()
+        else:
+            # open loop: latency counts from the scheduled send time, so a slow
+            # server can't hide queueing delay (coordinated omission)
+            sent_at = schedule.get()
+            if sent_at is None:
+                break
+            delay = sent_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            session.infer(inputs[i % len(inputs)])
+            latencies.append(time.perf_counter() - sent_at)
+        except Exception:
+            errors += 1
+        i += 1
+    session.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+
+def run(args, inputs):
+    results = {'latencies': [], 'errors': 0}
+    lock = threading.Lock()
+    clock = {}
+    ready = threading.Barrier(args.concurrency + 1)
+    go = threading.Event()
+    schedule = queue.Queue() if args.rate else None
+    threads = [threading.Thread(target=worker,
+                                args=(args, inputs, schedule, clock, ready, go, results, lock))
+               for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    clock['deadline'] = start + args.duration
+    go.set()
+    if schedule is not None:
+        # fixed-rate arrivals over the whole run
+        n = int(args.rate * args.duration)
+        for k in range(n):
+            schedule.put(start + k / args.rate)
+        for _ in threads:
+            schedule.put(None)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return np.asarray(results['latencies']) * 1000, results['errors'], elapsed
+
+### Report ###
+def histogram(latencies, buckets=12, width=40):
+    edges = np.geomspace(max(latencies.min(), 0.1), latencies.max() * 1.0001, buckets + 1)
+    counts, _ = np.histogram(latencies, bins=edges)
+    lines = []
+    for lo, hi, c in zip(edges[:-1], edges[1:], counts):
+        bar = '#' * int(round(width * c / max(counts.max(), 1)))
+        lines.append(f"{lo:9.1f} - {hi:9.1f} ms | {c:7d} {bar}")
+    return "\n".join(lines)
+
+def report(args, latencies, errors, elapsed):
+    total = len(latencies) + errors
+    summary = {
+        'model': args.model,
+        'transport': args.transport,
+        'mode': f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}",
+        'requests': total,
+        'throughput_rps': len(latencies) / elapsed,
+        'error_rate': errors / total if total else 0.0,
+    }
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary.update(mean_ms=float(latencies.mean()), p50_ms=float(p50),
+                       p95_ms=float(p95), p99_ms=float(p99), max_ms=float(latencies.max()))
+    for key, value in summary.items():
+        print(f"{key:>15}: {value:.2f}" if isinstance(value, float) else f"{key:>15}: {value}")
+    if len(latencies):
+        print(histogram(latencies))
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2))
+    return summary
+
+def main(args):
+    server = None
+    if args.mock:
+        from mock_kserve_server import serve
+        host, port = args.url.rsplit(":", 1)
+        server = serve(host, int(port), latency_ms=args.mock_latency_ms,
+                       error_rate=args.mock_error_rate)
+        print(f"Started mock KServe v2 server on {args.url}")
+    try:
+        inputs = load_inputs(args.model, args.images)
+        latencies, errors, elapsed = run(args, inputs)
+        report(args, latencies, errors, elapsed)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Latency/throughput benchmark for MAX Serving')
+    parser.add_argument('--url', type=str, default='localhost:8000')
+    parser.add_argument('--grpc-url', type=str, default=None)
+    parser.add_argument('--transport', type=str, default='http', choices=TRANSPORTS)
+    parser.add_argument('--model', type=str, default='resnet50', help='resnet50 | efficientnet')
+    parser.add_argument('--images', type=str, default=None, help='directory of images to replay')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='concurrent clients (closed loop), or senders when --rate is set')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='target requests/s (open loop), 0 for closed loop')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--json', type=str, default=None, help='write the summary to this file')
+    parser.add_argument('--mock', action='store_true',
+                        help='start a local mock KServe v2 server on --url')
+    parser.add_argument('--mock-latency-ms', type=float, default=5.0)
+    parser.add_argument('--mock-error-rate', type=float, default=0.0)
+    main(parser.parse_args())
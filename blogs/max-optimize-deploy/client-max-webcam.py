@@ -1,10 +1,13 @@
 import cv2
 import numpy as np
-import tritonclient.http as httpclient
-import tensorflow as tf
 import json
 import argparse
+import queue
+import threading
 import time
+from collections import deque
+from preprocessing import MODEL_MODES, BatchPreprocessor, decode_predictions
+from triton_session import TRANSPORTS, TritonSession
 
 width = 1280
 height = 720
@@ -12,79 +15,268 @@ scale_factor = 0.2
 text_color = (0, 0, 255)
 
 ### Image pre-processing ###
-def image_preprocess(preprocess_fn,img,reps=1):
-   img = np.asarray(np.resize(img,(224, 224,3)),dtype=np.float32)
-   img = np.stack([img]*reps)
-   img = preprocess_fn(img)
-   return img
+def image_preprocess(preprocessor,img,reps=1):
+   # writes into the preprocessor's reused float32 buffer, no per-frame allocations
+   return preprocessor.replicate(img, reps)
 
-def main(args):
-    model_name = args.model
-    client = httpclient.InferenceServerClient(url="the-machine.local:8000")
+### Frame sources ###
+class SyntheticSource:
+    """Moving square on a changing background, for running without a camera."""
+    def __init__(self, fps=30):
+        self.frame_interval = 1.0 / fps
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        self.count = 0
+        self.next_frame_at = time.time()
+
+    def read(self):
+        delay = self.next_frame_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_at = max(self.next_frame_at, time.time() - 1) + self.frame_interval
+        self.frame[:] = (self.count * 3 % 255, 80, 160)
+        x = self.count * 8 % (width - 200)
+        self.frame[260:460, x:x + 200] = 255
+        self.count += 1
+        return True, self.frame.copy()
 
-    vidcap = cv2.VideoCapture(1)
+    def release(self):
+        pass
+
+def open_source(source):
+    # camera index, video file or "synthetic"
+    if source == "synthetic":
+        return SyntheticSource()
+    vidcap = cv2.VideoCapture(int(source) if source.isdigit() else source)
     vidcap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
     vidcap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return vidcap
 
+def get_model_io(model_name):
     if model_name=="resnet50":
-        preprocess_fn = tf.keras.applications.resnet.preprocess_input
-        decode_fn = tf.keras.applications.resnet.decode_predictions
         input_name = "input_1" # from input metadata
     else:
-        preprocess_fn = tf.keras.applications.efficientnet.preprocess_input
-        decode_fn = tf.keras.applications.efficientnet.decode_predictions
         input_name = "input_2" # from input metadata
+    preprocessor = BatchPreprocessor(mode=MODEL_MODES.get(model_name, "none"))
+    return input_name, preprocessor
+
+def open_session(args, input_name, in_flight=1):
+    # request objects and connections are created once and reused for every frame.
+    # The session asks for raw FP32 probabilities in the binary part of the
+    # response (4 KB) instead of 1000 "score:index" classification strings
+    return TritonSession(args.url, args.model, input_name, (1, 224, 224, 3),
+                         transport=args.transport, in_flight=in_flight,
+                         grpc_url=args.grpc_url)
+
+def decode_label(probs, decode_fn=decode_predictions):
+    ### Decoding predictions ###
+    labels = decode_fn(probs, top=1)
+    return labels[0][0][1]
+
+def main(args):
+    model_name = args.model
+    vidcap = open_source(args.source)
+    input_name, preprocessor = get_model_io(model_name)
+    session = open_session(args, input_name)
 
     time_inference=[]
     walltime_start=time.time()
     while True:
-        _, frame = vidcap.read()
+        ok, frame = vidcap.read()
+        if not ok:
+            break
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         scaled_frame = cv2.resize(rgb_frame, (224,224))
-        img = image_preprocess(preprocess_fn,scaled_frame)
-
-        inputs = httpclient.InferInput(input_name, 
-                                        img.shape, 
-                                        datatype="FP32")
-        
-        inputs.set_data_from_numpy(img, binary_data=True)
-
-        outputs = httpclient.InferRequestedOutput("predictions", 
-                                    binary_data=True, 
-                                    class_count=1000)
-        
-        start_time = time.time()        
-        results = client.infer(model_name=model_name, 
-                inputs=[inputs], 
-                outputs=[outputs])
-        time_inference.append(time.time() - start_time)
-
-        inference_output = results.as_numpy('predictions')
+        img = image_preprocess(preprocessor,scaled_frame)
 
-        ### Process request ###
-        idx = [int(out.decode().split(':')[1]) for out in inference_output]
-        probs = [float(out.decode().split(':')[0]) for out in inference_output]
+        start_time = time.time()
+        probs = session.infer(img)
+        time_inference.append(time.time() - start_time)
 
-        ### Decoding predictions ###
-        probs = np.array(probs)[np.argsort(idx)]
-        labels = decode_fn(np.expand_dims(probs, axis=0), top=5)
+        label = decode_label(probs)
 
         font = cv2.FONT_HERSHEY_SIMPLEX
-        cv2.putText(frame, model_name+": "+labels[0][0][1], (30,60), font, 2, text_color, 3, cv2.LINE_AA)
+        cv2.putText(frame, model_name+": "+label, (30,60), font, 2, text_color, 3, cv2.LINE_AA)
         cv2.imshow('MAX Serving Demo', frame)
         if cv2.waitKey(1) & 0xFF == ord('q'):
-            print("Total inference time:",np.sum(time_inference))
-            print("Walltime:",time.time() - walltime_start)
-            print("Average inference latency(ms):",np.mean(time_inference) * 1000)
             break
 
+    print("Total inference time:",np.sum(time_inference))
+    print("Walltime:",time.time() - walltime_start)
+    print("Average inference latency(ms):",np.mean(time_inference) * 1000)
+
+    session.close()
     vidcap.release()
     cv2.destroyAllWindows()
 
+### Pipelined mode ###
+def put_latest(q, item):
+    # bounded queue that keeps the newest items: drop the oldest one when full
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+class PipelineStats:
+    # counters updated by the capture and inference threads
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'captured': 0, 'dropped': 0, 'errors': 0}
+
+    def add(self, **counts):
+        with self._lock:
+            for key, n in counts.items():
+                self.counts[key] += n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+def capture_stage(vidcap, infer_q, stop, stats, max_frames):
+    captured = 0
+    while not stop.is_set():
+        ok, frame = vidcap.read()
+        if not ok or (max_frames and captured >= max_frames):
+            break
+        captured += 1
+        stats.add(captured=1, dropped=put_latest(infer_q, (time.time(), frame)))
+    infer_q.put(None)
+
+def inference_stage(session, preprocessor, infer_q, display_q, stop, stats, in_flight):
+    # keeps up to `in_flight` async requests outstanding, results are consumed in order
+    pending = deque()
+    done = False
+    while not stop.is_set():
+        if not done and len(pending) < in_flight:
+            try:
+                item = infer_q.get(timeout=0.005 if pending else 0.1)
+            except queue.Empty:
+                item = False
+            if item is None:
+                done = True
+            elif item is not False:
+                captured_at, frame = item
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                scaled_frame = cv2.resize(rgb_frame, (224,224))
+                img = image_preprocess(preprocessor,scaled_frame)
+                # the request serializes img, so the preprocessing buffer can be reused
+                pending.append((captured_at, frame, session.submit(img)))
+                continue
+        if pending:
+            # all slots busy or no new frame yet: wait for the oldest request
+            captured_at, frame, request = pending.popleft()
+            try:
+                label = decode_label(request.result())
+            except Exception as e:
+                stats.add(errors=1)
+                label = f"error: {e}"
+            stats.add(dropped=put_latest(display_q, (captured_at, frame, label)))
+        elif done:
+            break
+    display_q.put(None)
+
+def run_pipelined(args):
+    model_name = args.model
+    vidcap = open_source(args.source)
+    input_name, preprocessor = get_model_io(model_name)
+    session = open_session(args, input_name, args.in_flight)
+
+    infer_q = queue.Queue(maxsize=args.in_flight)
+    display_q = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    stats = PipelineStats()
+    stages = [
+        threading.Thread(target=capture_stage,
+                         args=(vidcap, infer_q, stop, stats, args.max_frames)),
+        threading.Thread(target=inference_stage,
+                         args=(session, preprocessor, infer_q, display_q, stop, stats, args.in_flight)),
+    ]
+    for stage in stages:
+        stage.start()
+
+    # display stays on the main thread, which GUI backends require
+    latencies = []
+    fps = 0.0
+    last_shown = None
+    walltime_start = time.time()
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    while True:
+        item = display_q.get()
+        if item is None:
+            break
+        captured_at, frame, label = item
+        now = time.time()
+        latencies.append(now - captured_at)
+        if last_shown is not None:
+            # exponential moving average of the displayed frame rate
+            instant_fps = 1 / max(now - last_shown, 1e-6)
+            fps = 0.9 * fps + 0.1 * instant_fps if fps else instant_fps
+        last_shown = now
+        if args.headless:
+            continue
+        cv2.putText(frame, model_name+": "+label, (30,60), font, 2, text_color, 3, cv2.LINE_AA)
+        cv2.putText(frame, f"FPS: {fps:.1f}  latency: {latencies[-1] * 1000:.0f} ms",
+                    (30,120), font, 1, text_color, 2, cv2.LINE_AA)
+        cv2.imshow('MAX Serving Demo', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            stop.set()
+            break
+
+    stop.set()
+    # unblock the stages if display stopped early
+    while any(stage.is_alive() for stage in stages):
+        for q in (infer_q, display_q):
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+        time.sleep(0.01)
+
+    walltime = time.time() - walltime_start
+    counts = stats.snapshot()
+    print("Frames captured:", counts['captured'], "dropped:", counts['dropped'],
+          "errors:", counts['errors'], "displayed:", len(latencies))
+    print("Walltime:", walltime)
+    if latencies:
+        print("Throughput (FPS):", len(latencies) / walltime)
+        print("End-to-end latency p50/p95 (ms):",
+              np.percentile(latencies, 50) * 1000, np.percentile(latencies, 95) * 1000)
+
+    session.close()
+    vidcap.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('--model', 
-                      type=str, 
-                      default='resnet50', 
+    parser.add_argument('--model',
+                      type=str,
+                      default='resnet50',
                       help='Choose: Resnet50 | efficientnet')
-    main(parser.parse_args())
\ No newline at end of file
+    parser.add_argument('--url', type=str, default='the-machine.local:8000',
+                        help='MAX Serving (Triton) HTTP endpoint')
+    parser.add_argument('--transport', type=str, default='http', choices=TRANSPORTS,
+                        help='http, grpc or shm (shared memory, server on the same host)')
+    parser.add_argument('--grpc-url', type=str, default=None,
+                        help='gRPC endpoint, defaults to port 8001 on the --url host')
+    parser.add_argument('--source', type=str, default='1',
+                        help='camera index, video file or "synthetic"')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='run capture, inference and display as separate stages')
+    parser.add_argument('--in-flight', type=int, default=2,
+                        help='concurrent inference requests in pipelined mode')
+    parser.add_argument('--headless', action='store_true',
+                        help='do not open a window (pipelined mode)')
+    parser.add_argument('--max-frames', type=int, default=0,
+                        help='stop after this many frames, 0 runs until the source ends (pipelined mode)')
+    args = parser.parse_args()
+    if args.pipelined:
+        run_pipelined(args)
+    else:
+        main(args)
@@ -0,0 +1,197 @@
+"""Local stand-in for MAX Serving's KServe v2 HTTP endpoint.
+
+Serves `resnet50` and `efficientnet` with fake predictions after a configurable
+latency, including the binary tensor extension and the classification
+extension, so the clients and benchmarks can run without the real container.
+"""
+
+import argparse
+import gzip
+import json
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# model name -> (input name, output name), mirroring the MAX Serving demo models
+MODELS = {
+    "resnet50": ("input_1", "predictions"),
+    "efficientnet": ("input_2", "predictions"),
+}
+DTYPES = {
+    "FP32": np.float32, "FP16": np.float16, "FP64": np.float64,
+    "INT64": np.int64, "INT32": np.int32, "UINT8": np.uint8,
+}
+NUM_CLASSES = 1000
+
+
+def fake_predictions(batch):
+    # cheap, deterministic "probabilities": the class follows the mean pixel value
+    batch = batch.reshape(len(batch), -1)
+    classes = (np.abs(batch.mean(axis=1)) * 7919).astype(np.int64) % NUM_CLASSES
+    probs = np.full((len(batch), NUM_CLASSES), 0.5 / (NUM_CLASSES - 1), dtype=np.float32)
+    probs[np.arange(len(batch)), classes] = 0.5
+    return probs
+
+
+def serialize_bytes(values):
+    return b"".join(struct.pack("<I", len(v)) + v for v in values)
+
+
+def classification(probs, class_count):
+    # Triton classification extension: "score:index" strings, best first
+    idx = np.argsort(-probs, axis=1)[:, :class_count]
+    return [
+        [f"{row[i]:f}:{i}".encode() for i in row_idx]
+        for row, row_idx in zip(probs, idx)
+    ]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency_ms = 0.0
+    error_rate = 0.0
+    stats = {"requests": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode(),
+                   {"Content-Type": "application/json"})
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if self.path in ("/v2/health/ready", "/v2/health/live"):
+            self._send(200)
+        elif len(parts) >= 3 and parts[:2] == ["v2", "models"] and parts[2] in MODELS:
+            input_name, output_name = MODELS[parts[2]]
+            if parts[-1] == "ready":
+                self._send(200)
+            else:
+                self._send_json(200, {
+                    "name": parts[2], "platform": "mock",
+                    "inputs": [{"name": input_name, "datatype": "FP32", "shape": [-1, 224, 224, 3]}],
+                    "outputs": [{"name": output_name, "datatype": "FP32", "shape": [-1, NUM_CLASSES]}],
+                })
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def _read_body(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        return body
+
+    def do_POST(self):
+        start = time.perf_counter()
+        # always consume the body so the keep-alive connection stays usable
+        body = self._read_body()
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 4 or parts[:2] != ["v2", "models"] or parts[3] != "infer" \
+                or parts[2] not in MODELS:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        with self.lock:
+            self.stats["requests"] += 1
+            fail = np.random.rand() < self.error_rate
+        header_length = int(self.headers.get("Inference-Header-Content-Length", len(body)))
+        request = json.loads(body[:header_length])
+        binary = memoryview(body)[header_length:]
+
+        input_name, output_name = MODELS[parts[2]]
+        tensors = {}
+        offset = 0
+        for spec in request["inputs"]:
+            dtype = DTYPES[spec["datatype"]]
+            size = spec.get("parameters", {}).get("binary_data_size")
+            if size is not None:
+                data = np.frombuffer(binary[offset:offset + size], dtype=dtype)
+                offset += size
+            else:
+                data = np.asarray(spec["data"], dtype=dtype)
+            tensors[spec["name"]] = data.reshape(spec["shape"])
+        if input_name not in tensors:
+            self._send_json(400, {"error": f"missing input {input_name}"})
+            return
+        if fail:
+            with self.lock:
+                self.stats["errors"] += 1
+            self._send_json(500, {"error": "injected failure"})
+            return
+
+        probs = fake_predictions(tensors[input_name])
+        remaining = self.latency_ms / 1000 - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+
+        requested = request.get("outputs") or [{"name": output_name}]
+        outputs, blobs = [], []
+        binary_default = request.get("parameters", {}).get("binary_data_output", False)
+        for spec in requested:
+            params = spec.get("parameters", {})
+            class_count = params.get("classification", 0)
+            if class_count:
+                values = classification(probs, class_count)
+                shape, datatype = [len(values), class_count], "BYTES"
+                flat = [v for row in values for v in row]
+                raw = serialize_bytes(flat)
+                json_data = [v.decode() for v in flat]
+            else:
+                shape, datatype = list(probs.shape), "FP32"
+                raw = probs.tobytes()
+                json_data = probs.ravel().tolist()
+            output = {"name": spec["name"], "datatype": datatype, "shape": shape}
+            if params.get("binary_data", binary_default):
+                output["parameters"] = {"binary_data_size": len(raw)}
+                blobs.append(raw)
+            else:
+                output["data"] = json_data
+            outputs.append(output)
+
+        header = json.dumps({"model_name": parts[2], "outputs": outputs}).encode()
+        headers = {"Content-Type": "application/octet-stream"}
+        if blobs:
+            headers["Inference-Header-Content-Length"] = str(len(header))
+        self._send(200, header + b"".join(blobs), headers)
+
+
+def serve(host="127.0.0.1", port=8000, latency_ms=0.0, error_rate=0.0):
+    """Start the mock server in a background thread and return it."""
+    Handler.latency_ms = latency_ms
+    Handler.error_rate = error_rate
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock KServe v2 HTTP server for the MAX Serving demos")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated inference time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failing requests")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency_ms, args.error_rate)
+    print(f"Mock KServe v2 server on http://{args.host}:{args.port}, models: {list(MODELS)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
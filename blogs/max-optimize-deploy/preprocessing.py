@@ -0,0 +1,137 @@
+"""TensorFlow-free ImageNet preprocessing and prediction decoding.
+
+Pure NumPy equivalents of `tf.keras.applications.*.preprocess_input` and
+`decode_predictions`, so clients don't have to import TensorFlow. Batches are
+written into a preallocated float32 buffer that is reused between calls and
+normalized in place.
+
+The same file is in `max-blogpost-demos` and `max-optimize-deploy`. Each blog
+folder is used on its own, so keep the two copies identical.
+"""
+
+import json
+import os
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+# keras.applications preprocessing mode per model
+MODEL_MODES = {"resnet50": "caffe", "efficientnet": "none"}
+
+CAFFE_MEAN_BGR = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+TORCH_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255
+TORCH_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255
+
+CLASS_INDEX_URL = (
+    "https://storage.googleapis.com/download.tensorflow.org/"
+    "data/imagenet_class_index.json"
+)
+# same location keras caches it, so an existing download is reused
+CLASS_INDEX_PATH = Path(os.environ.get("KERAS_HOME", "~/.keras")).expanduser() / (
+    "models/imagenet_class_index.json"
+)
+
+
+def _normalize(x, mode):
+    # expects BGR channel order for caffe mode, RGB otherwise
+    if mode == "caffe":
+        x -= CAFFE_MEAN_BGR
+    elif mode == "torch":
+        x -= TORCH_MEAN
+        x /= TORCH_STD
+    elif mode == "tf":
+        x /= 127.5
+        x -= 1.0
+    elif mode != "none":
+        raise ValueError(f"Unknown preprocessing mode: {mode}")
+    return x
+
+
+def preprocess_input(x, mode="caffe"):
+    """Normalize a float32 RGB array of shape (..., 3) in place and return it.
+
+    - caffe: RGB -> BGR, subtract the ImageNet mean (ResNet50)
+    - torch: scale to [0, 1], subtract mean and divide by std per channel
+    - tf: scale to [-1, 1]
+    - none: unchanged (EfficientNet normalizes inside the model)
+    """
+    if mode == "caffe":
+        x[...] = x[..., ::-1]
+    return _normalize(x, mode)
+
+
+class BatchPreprocessor:
+    """Resizes and normalizes images into a reusable (batch, h, w, 3) buffer.
+
+    The array returned by `__call__` and `replicate` is a view of the internal
+    buffer and is overwritten by the next call.
+    """
+
+    def __init__(self, batch_size=1, size=(224, 224), mode="caffe"):
+        self.size = size
+        self.mode = mode
+        self.buffer = np.empty((batch_size, size[1], size[0], 3), dtype=np.float32)
+
+    def _ensure_capacity(self, n):
+        if n > len(self.buffer):
+            self.buffer = np.empty((n, *self.buffer.shape[1:]), dtype=np.float32)
+
+    def _load(self, img, out):
+        # PIL images are resized here, arrays are expected to be (h, w, 3) already
+        if hasattr(img, "resize") and not isinstance(img, np.ndarray):
+            img = img.convert("RGB").resize(self.size)
+        img = np.asarray(img)
+        # caffe mode wants BGR, flip channels while copying into the buffer
+        out[...] = img[..., ::-1] if self.mode == "caffe" else img
+
+    def __call__(self, imgs):
+        self._ensure_capacity(len(imgs))
+        batch = self.buffer[: len(imgs)]
+        for i, img in enumerate(imgs):
+            self._load(img, batch[i])
+        return _normalize(batch, self.mode)
+
+    def replicate(self, img, reps=1):
+        """Batch of `reps` copies of one image, normalized only once."""
+        self._ensure_capacity(reps)
+        batch = self.buffer[:reps]
+        self._load(img, batch[0])
+        _normalize(batch[:1], self.mode)
+        batch[1:] = batch[0]
+        return batch
+
+
+_class_index = None
+
+
+def load_class_index():
+    global _class_index
+    if _class_index is None:
+        if not CLASS_INDEX_PATH.exists():
+            CLASS_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+            urllib.request.urlretrieve(CLASS_INDEX_URL, CLASS_INDEX_PATH)
+        with open(CLASS_INDEX_PATH) as f:
+            index = json.load(f)
+        _class_index = [tuple(index[str(i)]) for i in range(len(index))]
+    return _class_index
+
+
+def top_k(probs, k=5):
+    """Indices of the k largest scores per row, sorted descending."""
+    probs = np.atleast_2d(probs)
+    k = min(k, probs.shape[-1])
+    idx = np.argpartition(probs, -k, axis=-1)[:, -k:]
+    order = np.argsort(np.take_along_axis(probs, idx, axis=-1), axis=-1)[:, ::-1]
+    return np.take_along_axis(idx, order, axis=-1)
+
+
+def decode_predictions(probs, top=5):
+    """Same output as keras `decode_predictions`: per sample a list of
+    (wnid, label, score) tuples, best first."""
+    probs = np.atleast_2d(probs)
+    class_index = load_class_index()
+    return [
+        [(*class_index[i], float(row[i])) for i in idx]
+        for row, idx in zip(probs, top_k(probs, top))
+    ]
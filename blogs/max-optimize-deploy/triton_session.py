@@ -0,0 +1,250 @@
+"""Reusable MAX Serving (Triton) client session.
+
+`TritonSession` creates the client, the request input/output objects and, for
+shared memory, the memory regions once and reuses them for every request. It
+supports three transports:
+
+- http: binary tensors over a persistent HTTP connection pool
+- grpc: the gRPC endpoint (port 8001 by default)
+- shm: HTTP control requests, tensors exchanged through system shared memory
+  (client and server must run on the same host)
+
+With `compression="gzip"` (or "deflate") the http and grpc transports compress
+the request and the response, which helps over slow links to a remote host.
+
+Up to `in_flight` requests can be outstanding at once with `submit`, whose
+handles are resolved with `.result()`.
+
+Run this file with `--benchmark` to compare the transports.
+"""
+
+import argparse
+import queue
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+TRANSPORTS = ("http", "grpc", "shm")
+COMPRESSIONS = (None, "gzip", "deflate")
+
+
+class _Pending:
+    def __init__(self, wait, release):
+        self._wait = wait
+        self._release = release
+        self._value = None
+        self._done = False
+
+    def result(self):
+        if not self._done:
+            try:
+                self._value = self._wait()
+            finally:
+                self._done = True
+                self._release()
+        return self._value
+
+
+class TritonSession:
+    def __init__(self, url, model_name, input_name, input_shape,
+                 output_name="predictions", num_classes=1000, transport="http",
+                 in_flight=1, grpc_url=None, timeout=60.0, compression=None):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport {transport}, choose from {TRANSPORTS}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression}, choose from {COMPRESSIONS}")
+        self.model_name = model_name
+        self.output_name = output_name
+        self.input_shape = tuple(input_shape)
+        self.output_shape = (self.input_shape[0], num_classes)
+        self.transport = transport
+        self.in_flight = in_flight
+        # shared memory tensors never go over the wire, nothing to compress
+        self.compression = compression if transport != "shm" else None
+        # free request slots, a slot is returned when its result is read
+        self._free_slots = queue.SimpleQueue()
+        for slot in range(in_flight):
+            self._free_slots.put(slot)
+
+        if transport == "grpc":
+            import tritonclient.grpc as client_lib
+            host = url.rsplit(":", 1)[0]
+            self.client = client_lib.InferenceServerClient(url=grpc_url or f"{host}:8001")
+        else:
+            import tritonclient.http as client_lib
+            # one persistent connection per in-flight request
+            self.client = client_lib.InferenceServerClient(
+                url=url, concurrency=in_flight,
+                connection_timeout=timeout, network_timeout=timeout)
+
+        # request objects are built once; a request is serialized when it is
+        # sent, so the objects can be refilled for the next request right away
+        self._requests = []
+        for slot in range(in_flight if transport == "shm" else 1):
+            inputs = [client_lib.InferInput(input_name, list(self.input_shape), "FP32")]
+            if transport == "grpc":
+                outputs = [client_lib.InferRequestedOutput(output_name)]
+            else:
+                outputs = [client_lib.InferRequestedOutput(output_name, binary_data=True)]
+            self._requests.append((inputs, outputs))
+
+        self._regions = []
+        self._region_names = []
+        if transport == "shm":
+            try:
+                self._setup_shared_memory()
+            except Exception:
+                try:
+                    self.close()
+                except Exception:
+                    pass
+                raise
+
+    def _setup_shared_memory(self):
+        import tritonclient.utils.shared_memory as shm
+
+        self._shm = shm
+        input_size = int(np.prod(self.input_shape)) * 4
+        output_size = int(np.prod(self.output_shape)) * 4
+        for slot, (inputs, outputs) in enumerate(self._requests):
+            names = []
+            for kind, size in (("input", input_size), ("output", output_size)):
+                name = f"{self.model_name}_{kind}_{slot}_{id(self)}"
+                handle = shm.create_shared_memory_region(name, f"/{name}", size)
+                self._regions.append(handle)
+                self.client.register_system_shared_memory(name, f"/{name}", size)
+                self._region_names.append(name)
+                names.append(name)
+            inputs[0].set_shared_memory(names[0], input_size)
+            outputs[0].set_shared_memory(names[1], output_size)
+
+    def _prepare(self, batch):
+        try:
+            slot = self._free_slots.get_nowait()
+        except queue.Empty:
+            raise RuntimeError(f"More than {self.in_flight} requests in flight")
+        inputs, outputs = self._requests[slot % len(self._requests)]
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self.transport == "shm":
+            self._shm.set_shared_memory_region(self._regions[2 * slot], [batch])
+        elif self.transport == "grpc":
+            inputs[0].set_data_from_numpy(batch)
+        else:
+            inputs[0].set_data_from_numpy(batch, binary_data=True)
+        return slot, inputs, outputs
+
+    def _release(self, slot):
+        self._free_slots.put(slot)
+
+    def _read(self, slot, result):
+        if self.transport == "shm":
+            # copy, the region is reused by the next request on this slot
+            return self._shm.get_contents_as_numpy(
+                self._regions[2 * slot + 1], np.float32, self.output_shape).copy()
+        return result.as_numpy(self.output_name)
+
+    def submit(self, batch):
+        """Send `batch` asynchronously, returns a handle with `.result()`."""
+        slot, inputs, outputs = self._prepare(batch)
+        try:
+            if self.transport == "grpc":
+                future = Future()
+
+                def callback(result, error):
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+
+                self.client.async_infer(self.model_name, inputs, callback,
+                                        outputs=outputs,
+                                        compression_algorithm=self.compression)
+                wait = lambda: self._read(slot, future.result())
+            else:
+                request = self.client.async_infer(
+                    self.model_name, inputs, outputs=outputs,
+                    request_compression_algorithm=self.compression,
+                    response_compression_algorithm=self.compression)
+                wait = lambda: self._read(slot, request.get_result())
+        except Exception:
+            self._release(slot)
+            raise
+        return _Pending(wait, lambda: self._release(slot))
+
+    def infer(self, batch):
+        return self.submit(batch).result()
+
+    def close(self):
+        if self._regions:
+            try:
+                # only this session's regions, other clients may share the server
+                for name in self._region_names:
+                    self.client.unregister_system_shared_memory(name)
+            finally:
+                # input and output region of every slot
+                for handle in self._regions:
+                    self._shm.destroy_shared_memory_region(handle)
+                self._regions = []
+                self._region_names = []
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_benchmark(session, num_requests, warmup=10):
+    batch = np.random.rand(*session.input_shape).astype(np.float32)
+    for _ in range(warmup):
+        session.infer(batch)
+
+    latencies = []
+    pending = []
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        if len(pending) == session.in_flight:
+            sent_at, handle = pending.pop(0)
+            handle.result()
+            latencies.append(time.perf_counter() - sent_at)
+        pending.append((time.perf_counter(), session.submit(batch)))
+    for sent_at, handle in pending:
+        handle.result()
+        latencies.append(time.perf_counter() - sent_at)
+    elapsed = time.perf_counter() - start
+    return np.asarray(latencies) * 1000, num_requests / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare MAX Serving client transports")
+    parser.add_argument("--benchmark", action="store_true", help="run the transport benchmark")
+    parser.add_argument("--url", type=str, default="localhost:8000", help="HTTP endpoint")
+    parser.add_argument("--grpc-url", type=str, default=None, help="gRPC endpoint, default <host>:8001")
+    parser.add_argument("--model", type=str, default="resnet50")
+    parser.add_argument("--input-name", type=str, default="input_1")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--transports", type=str, nargs="+", default=list(TRANSPORTS))
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--compression", type=str, default=None, choices=["gzip", "deflate"],
+                        help="compress http and grpc requests and responses")
+    args = parser.parse_args()
+    if not args.benchmark:
+        parser.error("nothing to do, pass --benchmark")
+
+    print(f"{'transport':>9} {'in_flight':>9} {'req/s':>8} {'p50_ms':>7} {'p99_ms':>7}")
+    for transport in args.transports:
+        for in_flight in args.in_flight:
+            try:
+                with TritonSession(args.url, args.model, args.input_name,
+                                   (args.batch_size, 224, 224, 3), transport=transport,
+                                   in_flight=in_flight, grpc_url=args.grpc_url,
+                                   compression=args.compression) as session:
+                    latencies, throughput = run_benchmark(session, args.requests)
+            except Exception as e:
+                print(f"{transport:>9} {in_flight:>9} failed: {e}")
+                continue
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{transport:>9} {in_flight:>9} {throughput:>8.1f} {p50:>7.1f} {p99:>7.1f}")
@@ -1,14 +1,15 @@
 import requests
-from bs4 import BeautifulSoup
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
-import random
+import numpy as np
 import re
+import threading
+import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
 
-# Combined function to fetch, preprocess text and return filtered words
-def fetch_and_preprocess_text(url):
-    # Define a set of stop words
-    STOP_WORDS = set([
+STOP_WORDS = frozenset([
     "i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours", "yourself", "yourselves",
     "he", "him", "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself", "they", "them", "their",
     "theirs", "themselves", "what", "which", "who", "whom", "this", "that", "these", "those", "am", "is", "are", "was",
@@ -19,51 +20,226 @@ def fetch_and_preprocess_text(url):
     "how", "all", "any", "both", "each", "few", "more", "most", "other", "some", "such", "no", "nor", "not", "only",
     "own", "same", "so", "than", "too", "very", "s", "t", "can", "will", "just", "don", "should", "now"
 ])
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    text = soup.body.get_text(separator=' ')
-    
-    text = text.lower()  # convert to lowercase
-    text = re.sub(r'[^\w\s]', '', text)  # remove punctuation
-    words = text.split()  # split into words
-    
-    filtered_words = [word for word in words if word not in STOP_WORDS]
-    return filtered_words
+PUNCTUATION = re.compile(r'[^\w\s]')
+# text inside these tags is not part of the page's words
+SKIPPED_TAGS = {"head", "script", "style", "template", "noscript"}
+
+_local = threading.local()
+
+
+def _words(text):
+    # lowercase, remove punctuation, split into words
+    return PUNCTUATION.sub('', text.lower()).split()
+
+
+class _TextExtractor(HTMLParser):
+    """Streams the visible text of an HTML page to `on_text`, one text node at a time.
+
+    No document tree is built, so a page is parsed while it is being read.
+    """
+
+    def __init__(self, on_text):
+        super().__init__(convert_charrefs=True)
+        self.on_text = on_text
+        self.skip_depth = 0
+        self.pending = []
+
+    def flush(self):
+        # a text node arrives in several pieces when it spans two chunks
+        if self.pending:
+            if not self.skip_depth:
+                self.on_text(''.join(self.pending))
+            self.pending = []
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        self.flush()
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    # comments, <!DOCTYPE> and <?...?> end a text node like a tag does
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def close(self):
+        super().close()
+        self.flush()
+
+
+def _read_chunks(source, chunk_size=1 << 16):
+    # text chunks of a URL or a local HTML file
+    if source.startswith(("http://", "https://")):
+        # one connection pool per thread
+        session = getattr(_local, "session", None)
+        if session is None:
+            session = _local.session = requests.Session()
+        with session.get(source, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or 'utf-8'
+            yield from response.iter_content(chunk_size, decode_unicode=True)
+    else:
+        with open(source, encoding='utf-8', errors='replace') as f:
+            yield from iter(lambda: f.read(chunk_size), '')
+
+
+def _parse(source, on_text):
+    parser = _TextExtractor(on_text)
+    for chunk in _read_chunks(source):
+        parser.feed(chunk)
+    parser.close()
+
+
+# Combined function to fetch, preprocess text and return filtered words
+def fetch_and_preprocess_text(url):
+    words = []
+    _parse(url, lambda text: words.extend(w for w in _words(text) if w not in STOP_WORDS))
+    return words
+
+
+def count_words(source):
+    """Word frequencies of one URL or local HTML file, without stop words"""
+    counts = Counter()
+    # Counter.update counts a list in C, stop words are removed once at the end
+    _parse(source, lambda text: counts.update(_words(text)))
+    for word in STOP_WORDS.intersection(counts):
+        del counts[word]
+    return counts
+
+
+def word_frequencies(sources, max_workers=8, skip_errors=False):
+    """Word frequencies over many URLs or local HTML files, fetched concurrently
+
+    Returns a Counter. With `skip_errors`, sources that fail are skipped with
+    a warning instead of raising.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    total = Counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(count_words, source): source for source in sources}
+        for future in as_completed(futures):
+            try:
+                total.update(future.result())
+            except Exception as e:
+                if not skip_errors:
+                    raise
+                warnings.warn(f"Skipping {futures[future]}: {e}")
+    return total
+
+
+def frequency_arrays(counts):
+    """(unique, counts) NumPy arrays of a Counter, sorted by word like np.unique"""
+    unique = np.array(sorted(counts), dtype=str)
+    return unique, np.fromiter((counts[w] for w in unique), dtype=np.int64, count=len(unique))
 
 # Function to plot words using matplotlib
-def plot_word_cloud(unique_words, word_frequencies):
+def plot_word_cloud(unique_words, word_frequencies=None, min_frequency=4, max_words=200):
+    """Draw the words at random positions, sized by frequency.
+
+    Only the `max_words` most frequent words with at least `min_frequency`
+    occurrences are drawn. Pass `max_words=None` to draw all of them, like the
+    original version did. Positions and colors are generated as arrays, but
+    each word is still its own `plt.text`, so the drawing time grows with
+    `max_words`.
+    """
+    # a Counter can be passed on its own
+    if word_frequencies is None:
+        unique_words, word_frequencies = frequency_arrays(unique_words)
+    words = np.asarray(unique_words, dtype=str)
+    frequencies = np.asarray(word_frequencies, dtype=np.int64)
+
     plt.figure(figsize=(12, 8))
     plt.axis('off')
-    
-    def random_color():
-        return f'#{random.randint(0, 0xFFFFFF):06x}'
-    
-    max_freq = sorted(word_frequencies)[-1]
+    if not len(frequencies):
+        plt.show()
+        return
+
+    max_freq = frequencies.max()
     scaling_factor = 100 / max_freq  # Adjust as needed for different text sizes
-    
-    for i in range(len(unique_words)):
-        if word_frequencies[i] > 3:
-            plt.text(
-                random.uniform(0, 1), 
-                random.uniform(0, 1), 
-                unique_words[i], 
-                fontsize=word_frequencies[i] * scaling_factor, 
-                color=random_color(), 
-                ha='center', 
-                va='center', 
-                alpha=0.7
-            )
-    
+
+    # only the max_words most frequent words get a text artist
+    shown = np.flatnonzero(frequencies >= min_frequency)
+    if max_words is not None and len(shown) > max_words:
+        shown = shown[np.argpartition(frequencies[shown], -max_words)[-max_words:]]
+
+    rng = np.random.default_rng()
+    positions = rng.uniform(0, 1, size=(len(shown), 2))
+    colors = rng.integers(0, 0xFFFFFF, size=len(shown), endpoint=True)
+    for i, (x, y), color in zip(shown, positions, colors):
+        plt.text(
+            x,
+            y,
+            words[i],
+            fontsize=frequencies[i] * scaling_factor,
+            color=f'#{color:06x}',
+            ha='center',
+            va='center',
+            alpha=0.7
+        )
+
     plt.show()
 
-def plot_points(points_data, pi_approximation):
-    # Visualize the points and the approximated circle using matplotlib
-    inside_x, inside_y = zip(*points_data["inside"])
-    outside_x, outside_y = zip(*points_data["outside"])
-    print(points_data["inside"])
+
+def _as_points(points):
+    # (n, 2) float array from a list of [x, y] pairs or an array
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def _density(points, bins):
+    # points per pixel over [-1, 1] x [-1, 1], rows are y
+    pixels = ((points + 1) * (bins / 2)).astype(np.int64).clip(0, bins - 1)
+    counts = np.bincount(pixels[:, 1] * bins + pixels[:, 0], minlength=bins * bins)
+    return counts.reshape(bins, bins)
+
+
+def plot_points(points_data, pi_approximation, max_points=20000, rasterize=True, bins=512):
+    """Plot the Monte Carlo points inside and outside the unit circle.
+
+    Up to `max_points` points are drawn as a scatter plot. Beyond that they are
+    drawn as a `bins` x `bins` density image, or as a random sample of
+    `max_points` points when `rasterize` is False. Both take the same time
+    however many points there are.
+    """
+    inside = _as_points(points_data["inside"])
+    outside = _as_points(points_data["outside"])
+    total = len(inside) + len(outside)
+
     plt.figure(figsize=(10, 10))
-    plt.scatter(inside_x, inside_y, color='blue', label='Inside Circle')
-    plt.scatter(outside_x, outside_y, color='red', label='Outside Circle')
+    if total <= max_points:
+        plt.scatter(inside[:, 0], inside[:, 1], color='blue', label='Inside Circle')
+        plt.scatter(outside[:, 0], outside[:, 1], color='red', label='Outside Circle')
+    elif rasterize:
+        image = np.zeros((bins, bins, 4))
+        for points, color in ((inside, (0, 0, 1)), (outside, (1, 0, 0))):
+            density = _density(points, bins)
+            image[..., :3][density > 0] = color
+            # log scale, sparse pixels stay visible
+            image[..., 3] = np.maximum(image[..., 3], np.log1p(density) / np.log1p(max(density.max(), 1)))
+        plt.imshow(image, extent=(-1, 1, -1, 1), origin='lower', interpolation='nearest')
+        # legend entries for the image
+        plt.scatter([], [], color='blue', label='Inside Circle')
+        plt.scatter([], [], color='red', label='Outside Circle')
+    else:
+        rng = np.random.default_rng()
+        # same share of inside and outside points as the full set
+        n_inside = round(max_points * len(inside) / total)
+        inside = inside[rng.choice(len(inside), n_inside, replace=False)]
+        outside = outside[rng.choice(len(outside), max_points - n_inside, replace=False)]
+        plt.scatter(inside[:, 0], inside[:, 1], color='blue', s=4, label='Inside Circle')
+        plt.scatter(outside[:, 0], outside[:, 1], color='red', s=4, label='Outside Circle')
     circle = plt.Circle((0, 0), 1, color='green', fill=False, linestyle='--')
     plt.gca().add_artist(circle)
     plt.xlim(-1, 1)